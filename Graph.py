@@ -1,11 +1,24 @@
 """Graph class to handle roatrip routing using a weighted graph"""
 
 from heapq import heappush, heappop
-from typing import Any
+from math import hypot
+from collections import deque
+from collections.abc import Mapping
+from copy import copy
+from typing import Any, Callable, Sequence
+
+import numpy as np
+
+from Metrics import metrics
+from Spatial import kNearest
 
 type Vertex = Any
 
 
+class SolveCancelled(Exception):
+    """Raised by a solver when its stop callback asks it to give up (e.g. the Cancel button)."""
+
+
 class Graph:
     """
     A class that uses an adjacency list to keep track of edges
@@ -19,6 +32,8 @@ class Graph:
         self.edges: list[
             tuple[float, "Vertex", "Vertex"]
         ] = []  # edges = roads in between the landmarks
+        # (vertex1, vertex2) -> weight in both directions for O(1) lookups, cheapest if there are parallel edges
+        self.edgeIndex: dict[tuple["Vertex", "Vertex"], float] = {}
 
     def __str__(self) -> str:
         result = ""
@@ -53,25 +68,172 @@ class Graph:
             self.adj_list[vertex1].append([vertex2, weight])
             self.adj_list[vertex2].append([vertex1, weight])
             self.edges.append((weight, vertex1, vertex2))
+            if weight < self.edgeIndex.get((vertex1, vertex2), float("inf")):
+                self.edgeIndex[(vertex1, vertex2)] = weight
+                self.edgeIndex[(vertex2, vertex1)] = weight
         else:
             raise ValueError("Both vertices must exist in the graph.")
     
     def findEdge(self, vertex1, vertex2) -> list|None:
         """
         If the edge exists in the adjacenecy list:
-        - return edge in the form of list[weight, vertex1, vertex2] 
+        - return edge in the form of list[weight, vertex1, vertex2] (cheapest one if there are parallel edges)
         else return None
+        O(1) lookup in the edge index kept up to date by addEdge
         """
-        w = None
-        for adjVert, weight in self.adj_list[vertex1]:
-            if adjVert == vertex2:
-                w = weight
-                break
-        
-        if w:
+        w = self.edgeIndex.get((vertex1, vertex2))
+        if w is not None:
             return [w, vertex1, vertex2]
         # raise Exception("Both vertices must exist in the graph.")
 
+    def distanceMatrix(self, vertices: Sequence[Vertex] | None = None) -> np.ndarray:
+        """
+        Dense matrix of edge weights where row/column i is vertices[i] (defaults to insertion order).
+        Missing edges are inf and the diagonal is 0.
+        """
+        if vertices is None:
+            vertices = list(self.adj_list)
+        index = {vert: i for i, vert in enumerate(vertices)}
+        dist = np.full((len(vertices), len(vertices)), np.inf)
+        np.fill_diagonal(dist, 0.0)
+        if self.edges:
+            # -1 marks edges to vertices outside the requested set
+            rows = np.fromiter((index.get(e[1], -1) for e in self.edges), np.int64, len(self.edges))
+            cols = np.fromiter((index.get(e[2], -1) for e in self.edges), np.int64, len(self.edges))
+            weights = np.fromiter((e[0] for e in self.edges), np.float64, len(self.edges))
+            keep = (rows >= 0) & (cols >= 0)
+            rows, cols, weights = rows[keep], cols[keep], weights[keep]
+            # keep the cheapest edge if there are parallel ones
+            np.minimum.at(dist, (rows, cols), weights)
+            np.minimum.at(dist, (cols, rows), weights)
+        return dist
+
+    def minWeightMatching(
+        self,
+        vertices: Sequence[Vertex] | None = None,
+        greedy: bool = False,
+        neighbors: int | None = None,
+        stop: Callable[[], bool] | None = None,
+    ) -> list[tuple[float, Vertex, Vertex]]:
+        """
+        Minimum weight perfect matching between the given vertices using only the edges among them.
+        Returns the matched edges as (weight, vertex1, vertex2) like self.edges.
+        - default is exact: Edmonds' blossom algorithm, O(n^3)
+        - neighbors=k runs blossom on only each vertex's k cheapest edges, roughly O(k n^2) and almost always
+          optimal on geometric graphs. Vertices that end up unmatched are matched exactly among themselves.
+        - greedy=True takes the cheapest edge between two unmatched vertices until none are left, O(E log E)
+          for large vertex sets (no optimality guarantee, at most ~log n times worse)
+        stop: checked between blossom stages, SolveCancelled is raised once it returns True
+        """
+        if vertices is None:
+            vertices = list(self.adj_list)
+        index = {vert: i for i, vert in enumerate(vertices)}
+        # keep each edge once, from the vertex that comes first
+        edges = []
+        for i, vert in enumerate(vertices):
+            for adjVert, weight in self.adj_list[vert]:
+                j = index.get(adjVert)
+                if j is not None and j > i:
+                    edges.append((weight, i, j))
+
+        if greedy:
+            edges.sort(key=lambda e: e[0])
+            matched = set()
+            result = []
+            for weight, i, j in edges:
+                if i not in matched and j not in matched:
+                    matched.add(i)
+                    matched.add(j)
+                    result.append((weight, vertices[i], vertices[j]))
+            return result
+
+        if not edges:
+            return []
+        # parallel edges: only the cheapest between each pair matters
+        cheapest: dict[tuple[int, int], float] = {}
+        for weight, i, j in edges:
+            if weight < cheapest.get((i, j), float("inf")):
+                cheapest[(i, j)] = weight
+        pairs = sorted((weight, i, j) for (i, j), weight in cheapest.items())
+
+        sparse = bool(neighbors) and neighbors < len(vertices) - 1
+        if sparse:
+            incident: list[list[tuple[float, int, int]]] = [[] for _ in vertices]
+            for edge in pairs:
+                incident[edge[1]].append(edge)
+                incident[edge[2]].append(edge)
+            candidates = set()
+            for vertEdges in incident:
+                # pairs is sorted so each list is too
+                candidates.update(vertEdges[:neighbors])
+            pairs = sorted(candidates)
+
+        # blossom works with exact integer duals: flip weights so the max weight matching of max size is the min
+        maxWeight = pairs[-1][0]
+        scale = 2**30 / maxWeight if maxWeight > 0 else 1.0
+        maxScaled = round(maxWeight * scale)
+        mate = maxWeightMatching(
+            [(i, j, maxScaled - round(weight * scale) + 1) for weight, i, j in pairs],
+            maxCardinality=True,
+            stop=stop,
+        )
+        result = []
+        for i, j in enumerate(mate):
+            if i < j:
+                result.append((cheapest[(i, j)], vertices[i], vertices[j]))
+
+        if sparse:
+            # the candidate edges may not allow a perfect matching, fix up what is left with all edges
+            unmatched = [
+                vert for i, vert in enumerate(vertices) if i >= len(mate) or mate[i] == -1
+            ]
+            if unmatched:
+                result += self.minWeightMatching(unmatched, stop=stop)
+        return result
+
+    def eulerianCircuit(self, startVert: Vertex) -> list[Vertex]:
+        """
+        Closed walk from startVert that uses every edge exactly once (Hierholzer's algorithm).
+        Each vertex keeps a cursor into its incident edges so every edge is looked at a constant number of times.
+        Time complexity: O(V+E)
+        Parallel edges (like MST + matching in Christofides) are fine since edges are tracked by id.
+        """
+        if startVert not in self.adj_list:
+            raise ValueError("Start vertex must exist in the graph.")
+        incident: dict[Vertex, list[tuple[int, Vertex]]] = {vert: [] for vert in self.adj_list}
+        for edgeId, (_, vertex1, vertex2) in enumerate(self.edges):
+            incident[vertex1].append((edgeId, vertex2))
+            incident[vertex2].append((edgeId, vertex1))
+        for vert, vertEdges in incident.items():
+            if len(vertEdges) % 2:
+                raise ValueError(f"Vertex ({vert}) has odd degree, no Eulerian circuit exists.")
+
+        used = bytearray(len(self.edges))
+        cursor = dict.fromkeys(self.adj_list, 0)
+        stack = [startVert]
+        circuit = []
+        while stack:
+            vert = stack[-1]
+            vertEdges = incident[vert]
+            i = cursor[vert]
+            # skip edges already walked from the other end
+            while i < len(vertEdges) and used[vertEdges[i][0]]:
+                i += 1
+            if i == len(vertEdges):
+                # dead end, vertex is done so it goes on the circuit
+                circuit.append(stack.pop())
+                cursor[vert] = i
+            else:
+                edgeId, adjVert = vertEdges[i]
+                used[edgeId] = 1
+                cursor[vert] = i + 1
+                stack.append(adjVert)
+
+        if len(circuit) != len(self.edges) + 1:
+            raise ValueError("Graph edges are not connected, no Eulerian circuit exists.")
+        circuit.reverse()
+        return circuit
+
     def removeEdge(self, vertex1, vertex2):
         """Remove the first edge found that contains the two vertices."""
         raise NotImplementedError("TODO")
@@ -133,85 +295,1166 @@ class Graph:
         # ordered keys for which vertex to pass through
         dists[startVert] = 0
         visited = set()
-        while pq:
-            currentDistance, vertex = heappop(pq)
+        pushes = pops = scanned = 0
+        with metrics.span("dijkstra"):
+            while pq:
+                currentDistance, vertex = heappop(pq)
+                pops += 1
 
-            if vertex in visited:
-                continue
-            visited.add(vertex)
+                if vertex in visited:
+                    continue
+                visited.add(vertex)
+                scanned += len(self.adj_list[vertex])
 
-            for adjacentVertex, dist in self.adj_list[vertex]:
-                if adjacentVertex not in visited:
-                    # neighbor distance through current vertex
-                    newDistance = currentDistance + dist
-                    if newDistance < dists[adjacentVertex]:
-                        # if smaller distance than previous, add it to path
-                        dists[adjacentVertex] = newDistance
-                        heappush(pq, (newDistance, adjacentVertex))
+                for adjacentVertex, dist in self.adj_list[vertex]:
+                    if adjacentVertex not in visited:
+                        # neighbor distance through current vertex
+                        newDistance = currentDistance + dist
+                        if newDistance < dists[adjacentVertex]:
+                            # if smaller distance than previous, add it to path
+                            dists[adjacentVertex] = newDistance
+                            heappush(pq, (newDistance, adjacentVertex))
+                            pushes += 1
 
+        metrics.count("dijkstra.heapPushes", pushes + 1)
+        metrics.count("dijkstra.heapPops", pops)
+        metrics.count("dijkstra.edgesScanned", scanned)
         return dists
 
     def route(self, startVert, endVert) -> list:
         """
         This method uses Dijkstra's algoroithm to find the shortest path between two vertices.
+        Returns [] if endVert can't be reached.
         """
-        # Implement a function that uses BFS to find the shortest path (in terms of the number of edges) from one landmark to another if one exists.
-        if endVert not in self.adj_list:
+        path, _ = self.dijkstraRoute(startVert, endVert)
+        return path
+
+    def dijkstraRoute(self, startVert, endVert) -> tuple[list, float]:
+        """
+        Point to point Dijkstra: predecessors are recorded as distances improve and the search
+        stops as soon as endVert is settled instead of exploring the whole graph.
+        Returns (path, distance), ([], inf) if endVert can't be reached.
+        """
+        return self.aStarRoute(startVert, endVert, lambda vertex, target: 0.0)
+
+    def aStarRoute(
+        self,
+        startVert,
+        endVert,
+        heuristic: Callable[[Vertex, Vertex], float],
+    ) -> tuple[list, float]:
+        """
+        A* search, Dijkstra ordered by distance so far + heuristic(vertex, endVert).
+        The heuristic must never overestimate (e.g. straight line distance) for the path to be the shortest,
+        the better it estimates the fewer vertices get explored off the corridor between the two.
+        Returns (path, distance), ([], inf) if endVert can't be reached.
+        """
+        if startVert not in self.adj_list or endVert not in self.adj_list:
             raise ValueError("Both vertices must exist in the graph.")
-        dists = self.dijkstra(startVert)
-        shortestDistance = dists[endVert]
-        predecessors = {vertex: None for vertex in self.adj_list}
 
-        for vertex, distance in dists.items():
+        dists = {startVert: 0.0}
+        predecessors = {startVert: None}
+        visited = set()
+        pq = [(heuristic(startVert, endVert), startVert)]
+        while pq:
+            _, vertex = heappop(pq)
+            if vertex in visited:
+                continue
+            visited.add(vertex)
+            if vertex == endVert:
+                break
+            currentDistance = dists[vertex]
             for adjacentVertex, dist in self.adj_list[vertex]:
-                # check if the shortest distance to the neighbor from start is equal to shortest distance to current vertex + distance from current vertex to neighbor
-                if dists[adjacentVertex] == distance + dist:
-                    # if shortest distance to neighbor is sum, then this vertex is the predecessor to the neighbor
+                newDistance = currentDistance + dist
+                if newDistance < dists.get(adjacentVertex, float("inf")):
+                    dists[adjacentVertex] = newDistance
                     predecessors[adjacentVertex] = vertex
-                    # should be no predecessor to start
+                    heappush(
+                        pq, (newDistance + heuristic(adjacentVertex, endVert), adjacentVertex)
+                    )
+
+        if endVert not in visited:
+            return [], float("inf")
+        return self.tracePath(predecessors, endVert), dists[endVert]
+
+    def bidirectionalRoute(self, startVert, endVert) -> tuple[list, float]:
+        """
+        Bidirectional Dijkstra: search forward from startVert and backward from endVert (edges are undirected)
+        and stop once the two frontiers can't produce anything shorter than the best meeting point so far.
+        Roughly halves the radius each search has to cover.
+        Returns (path, distance), ([], inf) if endVert can't be reached.
+        """
+        if startVert not in self.adj_list or endVert not in self.adj_list:
+            raise ValueError("Both vertices must exist in the graph.")
+        if startVert == endVert:
+            return [startVert], 0.0
+
+        # index 0 is the forward search, 1 the backward search
+        dists = ({startVert: 0.0}, {endVert: 0.0})
+        predecessors = ({startVert: None}, {endVert: None})
+        visited = (set(), set())
+        pqs = ([(0.0, startVert)], [(0.0, endVert)])
+        best = float("inf")
+        meet = None
+        while pqs[0] and pqs[1]:
+            # no path through unsettled vertices can beat the best one found
+            if pqs[0][0][0] + pqs[1][0][0] >= best:
+                break
+            side = 0 if pqs[0][0][0] <= pqs[1][0][0] else 1
+            currentDistance, vertex = heappop(pqs[side])
+            if vertex in visited[side]:
+                continue
+            visited[side].add(vertex)
+            sideDists = dists[side]
+            otherDists = dists[1 - side]
+            for adjacentVertex, dist in self.adj_list[vertex]:
+                newDistance = currentDistance + dist
+                if newDistance < sideDists.get(adjacentVertex, float("inf")):
+                    sideDists[adjacentVertex] = newDistance
+                    predecessors[side][adjacentVertex] = vertex
+                    heappush(pqs[side], (newDistance, adjacentVertex))
+                # reached by both searches, check if this is the shortest meeting point
+                if adjacentVertex in otherDists:
+                    total = sideDists[adjacentVertex] + otherDists[adjacentVertex]
+                    if total < best:
+                        best = total
+                        meet = adjacentVertex
+
+        if meet is None:
+            return [], float("inf")
+        # start -> meet from the forward search, then meet -> end from the backward one
+        path = self.tracePath(predecessors[0], meet)
+        vertex = predecessors[1][meet]
+        while vertex is not None:
+            path.append(vertex)
+            vertex = predecessors[1][vertex]
+        return path, dists[0][meet] + dists[1][meet]
 
-        # backtrace steps from end
+    def tracePath(self, predecessors: dict, endVert) -> list:
+        """Back trace steps from endVert through predecessors (None at the start), in start to end order."""
         path = []
         currentVertex = endVert
-        while currentVertex:
-            path.insert(0, currentVertex)
+        while currentVertex is not None:
+            path.append(currentVertex)
             currentVertex = predecessors[currentVertex]
-
+        path.reverse()
         return path
 
     def kruskal(self) -> "Graph":
         """
         Kruskal's algorithm to find the minimum spanning tree of the graph.
+        Uses a disjoint set (union by rank, path halving) to detect cycles.
+        Time complexity: O(E log E) for the sort, near O(1) per union/find after
         """
-        # Sort edges by weight
-        self.edges.sort(key=lambda e: e[0])
-        mst = Graph()
-        # disjoint set of vertices to detect cycles. contains connections between vertices if they exist
-        disjointSet = []
-        for vert in self.adj_list:
-            mst.addVertex(vert)
-            disjointSet.append({vert})
-
-        for weight, vertex1, vertex2 in self.edges:
-            # if any set contains the vertex in disjointSet store in these
-            vert1Set = set()
-            vert2Set = set()
-            for mySet in disjointSet:
-                if vertex1 in mySet:
-                    vert1Set = mySet
-                if vertex2 in mySet:
-                    vert2Set = mySet
-
-            # if there is not already an edge between these two
-            if vert1Set is not vert2Set:
-                mst.addEdge(vertex1, vertex2, weight)
-                tempSet = vert1Set.union(vert2Set)
-                disjointSet.remove(vert1Set)
-                disjointSet.remove(vert2Set)
-                disjointSet.append(tempSet)
+        with metrics.span("kruskal"):
+            mst = Graph()
+            # disjoint set of vertices to detect cycles, parent pointers up to the root of each set
+            parent = {}
+            rank = {}
+            for vert in self.adj_list:
+                mst.addVertex(vert)
+                parent[vert] = vert
+                rank[vert] = 0
+
+            def find(vert):
+                while parent[vert] != vert:
+                    # path halving, point to grandparent while walking up
+                    parent[vert] = parent[parent[vert]]
+                    vert = parent[vert]
+                return vert
+
+            # sort a copy so the order of self.edges is left alone
+            treeSize = len(self.adj_list) - 1
+            with metrics.span("sort"):
+                edges = sorted(self.edges, key=lambda e: e[0])
+            scanned = 0
+            for weight, vertex1, vertex2 in edges:
+                scanned += 1
+                root1 = find(vertex1)
+                root2 = find(vertex2)
+                # if there is not already a path between these two
+                if root1 != root2:
+                    if rank[root1] < rank[root2]:
+                        root1, root2 = root2, root1
+                    parent[root2] = root1
+                    if rank[root1] == rank[root2]:
+                        rank[root1] += 1
+                    mst.addEdge(vertex1, vertex2, weight)
+                    if len(mst.edges) == treeSize:
+                        break
+
+        metrics.count("kruskal.edgesScanned", scanned)
+        metrics.count("kruskal.unions", len(mst.edges))
+        return mst
 
+    def prim(self) -> "Graph":
+        """
+        Prim's algorithm on the dense distance matrix, meant for complete graphs like the pin graph.
+        Time complexity: O(V^2) with numpy doing the O(V) relaxation per added vertex, no edge sorting
+        """
+        with metrics.span("prim"):
+            vertices = list(self.adj_list)
+            mst = Graph()
+            for vert in vertices:
+                mst.addVertex(vert)
+            dist = self.distanceMatrix(vertices)
+            _, parent = primTree(dist)
+            for i in range(1, len(vertices)):
+                if parent[i] != -1:
+                    mst.addEdge(vertices[parent[i]], vertices[i], float(dist[parent[i], i]))
         return mst
 
+    def minimumSpanningTree(self) -> "Graph":
+        """
+        Pick the MST algorithm by density: Prim when at least a quarter of all possible edges exist
+        (O(V^2) beats sorting ~V^2 edges), otherwise Kruskal (O(E log E)).
+        """
+        n = len(self.adj_list)
+        if n > 2 and 4 * len(self.edges) >= n * (n - 1) // 2:
+            return self.prim()
+        return self.kruskal()
+
+
+class AdjacencyView(Mapping):
+    """
+    Read only adjacency list view for graphs that keep their edges in arrays (DenseGraph, CSRGraph).
+    Each vertex's [[adjVert, weight], ...] list is built from the arrays on access.
+    """
+
+    def __init__(self, graph: "DenseGraph | CSRGraph"):
+        self.graph = graph
+
+    def __getitem__(self, vertex: Vertex) -> list[list]:
+        return self.graph[vertex]
+
+    def __iter__(self):
+        return iter(self.graph.vertices)
+
+    def __len__(self) -> int:
+        return len(self.graph.vertices)
+
+    def __contains__(self, vertex) -> bool:
+        return vertex in self.graph.index
+
+
+class DenseGraph(Graph):
+    """
+    Complete graph over points in the plane where weights are straight line distances.
+    Weights live in one n x n numpy matrix computed in a single vectorized call instead of n^2/2 addEdge calls,
+    each stored once instead of three times (two adjacency entries + the edges tuple).
+    Answers the same queries as Graph: graph[v], iteration, findEdge, edges, adj_list.
+    Vertices can be added, moved and removed in O(n) each (amortized for adds): only the vertex's row and column
+    are recomputed, and the arrays keep spare capacity so they aren't reallocated on every add.
+    """
+
+    def __init__(self, vertices: Sequence[Vertex], locations: Sequence[tuple[float, float]]):
+        # no Graph.__init__, adj_list and edges are views over the matrix instead of stored lists
+        self.vertices: list[Vertex] = list(vertices)
+        self.index: dict[Vertex, int] = {vert: i for i, vert in enumerate(self.vertices)}
+        # locations and matrix are views of the first n rows of these, the rest is room to grow
+        self.locationBuffer = np.asarray(locations, dtype=np.float64).reshape(-1, 2).copy()
+        self.matrixBuffer = pairwiseDistances(self.locationBuffer)
+        self.resizeViews()
+        self.adj_list = AdjacencyView(self)
+
+    def resizeViews(self) -> None:
+        n = len(self.vertices)
+        self.locations = self.locationBuffer[:n]
+        self.matrix = self.matrixBuffer[:n, :n]
+
+    def copy(self) -> "DenseGraph":
+        """Independent copy (same class and attributes) with the matrix copied instead of recomputed, O(n^2)."""
+        graph = copy(self)
+        graph.vertices = list(self.vertices)
+        graph.index = dict(self.index)
+        graph.locationBuffer = self.locations.copy()
+        graph.matrixBuffer = self.matrix.copy()
+        graph.resizeViews()
+        graph.adj_list = AdjacencyView(graph)
+        return graph
+
+    def updateRow(self, i: int) -> None:
+        """Recompute the distances of vertex id i to every other vertex, O(n)."""
+        x, y = self.locations[i]
+        row = np.hypot(self.locations[:, 0] - x, self.locations[:, 1] - y)
+        row[i] = 0.0
+        self.matrix[i, :] = row
+        self.matrix[:, i] = row
+
+    def __getitem__(self, vertex: Vertex) -> list[list]:
+        i = self.index[vertex]
+        row = self.matrix[i].tolist()
+        return [[vert, row[j]] for j, vert in enumerate(self.vertices) if j != i]
+
+    @property
+    def edges(self) -> list[tuple[float, Vertex, Vertex]]:
+        """Every edge as (weight, vertex1, vertex2), built on access so avoid it on big graphs."""
+        rows, cols = np.triu_indices(len(self.vertices), k=1)
+        weights = self.matrix[rows, cols].tolist()
+        return [
+            (weight, self.vertices[i], self.vertices[j])
+            for weight, i, j in zip(weights, rows.tolist(), cols.tolist())
+        ]
+
+    def addVertex(self, vertex, location: Sequence[float] | None = None):
+        """
+        Add a vertex at location with edges to every other vertex (moves it if it already exists).
+        Time complexity: O(n) amortized, the buffers double when full
+        """
+        if location is None:
+            raise TypeError("DenseGraph vertices need a location, weights come from vertex locations.")
+        if vertex in self.index:
+            self.moveVertex(vertex, location)
+            return
+        n = len(self.vertices)
+        if n == len(self.locationBuffer):
+            capacity = max(2 * n, 8)
+            locationBuffer = np.zeros((capacity, 2))
+            locationBuffer[:n] = self.locations
+            matrixBuffer = np.zeros((capacity, capacity))
+            matrixBuffer[:n, :n] = self.matrix
+            self.locationBuffer, self.matrixBuffer = locationBuffer, matrixBuffer
+        self.vertices.append(vertex)
+        self.index[vertex] = n
+        self.resizeViews()
+        self.locations[n] = location
+        self.updateRow(n)
+
+    def moveVertex(self, vertex, location: Sequence[float]) -> None:
+        """Move a vertex, only its n incident weights are recomputed, O(n)."""
+        i = self.index[vertex]
+        self.locations[i] = location
+        self.updateRow(i)
+
+    def removeVertex(self, vertex) -> None:
+        """
+        Remove a vertex and its edges, O(n).
+        The last vertex takes over its row and column, so the order of self.vertices changes.
+        """
+        i = self.index.pop(vertex)
+        last = len(self.vertices) - 1
+        if i != last:
+            moved = self.vertices[last]
+            self.vertices[i] = moved
+            self.index[moved] = i
+            self.locations[i] = self.locations[last]
+            self.matrix[i, :] = self.matrix[last, :]
+            self.matrix[:, i] = self.matrix[:, last]
+            self.matrix[i, i] = 0.0
+        self.vertices.pop()
+        self.resizeViews()
+
+    def addEdge(self, vertex1, vertex2, weight=1.0):
+        raise TypeError("DenseGraph already has every edge, weights come from vertex locations.")
+
+    def findEdge(self, vertex1, vertex2) -> list | None:
+        """O(1) matrix lookup, same [weight, vertex1, vertex2] form as Graph.findEdge"""
+        if vertex1 == vertex2:
+            return None
+        return [self.matrix.item(self.index[vertex1], self.index[vertex2]), vertex1, vertex2]
+
+    def distanceMatrix(self, vertices: Sequence[Vertex] | None = None) -> np.ndarray:
+        """The stored matrix itself (not a copy) when vertices is None, otherwise the rows/columns asked for."""
+        if vertices is None or vertices == self.vertices:
+            return self.matrix
+        rows = np.array([self.index[vert] for vert in vertices], dtype=np.int64)
+        return self.matrix[np.ix_(rows, rows)]
+
+    def minimumSpanningTree(self) -> Graph:
+        # always complete, so always dense
+        return self.prim()
+
+
+class CSRGraph(Graph):
+    """
+    Frozen compressed sparse row form of a graph for large road networks.
+    Vertices get integer ids (vertices[id] is the label, index[label] is the id) and the edges of vertex i are
+    targets[offsets[i]:offsets[i + 1]] with matching weights, all in flat numpy arrays (~12 bytes per half edge
+    instead of a Python list per half edge). bfs, dfs, dijkstra and route run on the arrays directly.
+    """
+
+    def __init__(
+        self,
+        vertices: Sequence[Vertex],
+        sources: Sequence[int],
+        targets: Sequence[int],
+        weights: Sequence[float],
+        directed: bool = False,
+    ):
+        # no Graph.__init__, adj_list and edges are views over the arrays instead of stored lists
+        self.vertices: list[Vertex] = list(vertices)
+        self.index: dict[Vertex, int] = {vert: i for i, vert in enumerate(self.vertices)}
+        self.directed = directed
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        weights = np.asarray(weights, dtype=np.float64)
+        if not directed:
+            # both half edges of edge k sit next to each other so adjacency order matches Graph.addEdge
+            sources, targets = (
+                np.stack((sources, targets), axis=1).ravel(),
+                np.stack((targets, sources), axis=1).ravel(),
+            )
+            weights = np.repeat(weights, 2)
+
+        # group half edges by source, stable so each vertex keeps the order its edges were given in
+        order = np.argsort(sources, kind="stable")
+        self.targets = targets[order].astype(np.int32)
+        self.weights = weights[order]
+        self.offsets = np.zeros(len(self.vertices) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=len(self.vertices)), out=self.offsets[1:])
+        self.adj_list = AdjacencyView(self)
+
+    @classmethod
+    def fromGraph(cls, graph: Graph) -> "CSRGraph":
+        """Freeze an adjacency list Graph into CSR form."""
+        vertices = list(graph.adj_list)
+        index = {vert: i for i, vert in enumerate(vertices)}
+        edges = graph.edges
+        return cls(
+            vertices,
+            np.fromiter((index[e[1]] for e in edges), np.int64, len(edges)),
+            np.fromiter((index[e[2]] for e in edges), np.int64, len(edges)),
+            np.fromiter((e[0] for e in edges), np.float64, len(edges)),
+        )
+
+    def __getitem__(self, vertex: Vertex) -> list[list]:
+        targets, weights = self.neighbors(self.index[vertex])
+        return [[self.vertices[t], w] for t, w in zip(targets.tolist(), weights.tolist())]
+
+    @property
+    def edges(self) -> list[tuple[float, Vertex, Vertex]]:
+        """Every edge as (weight, vertex1, vertex2), built on access so avoid it on big graphs."""
+        sources = np.repeat(np.arange(len(self.vertices)), np.diff(self.offsets))
+        keep = slice(None) if self.directed else sources <= self.targets
+        return [
+            (weight, self.vertices[s], self.vertices[t])
+            for weight, s, t in zip(
+                self.weights[keep].tolist(), sources[keep].tolist(), self.targets[keep].tolist()
+            )
+        ]
+
+    def neighbors(self, vertexId: int) -> tuple[np.ndarray, np.ndarray]:
+        """Target ids and weights of the edges leaving a vertex id (views, no copies)."""
+        start, end = self.offsets[vertexId], self.offsets[vertexId + 1]
+        return self.targets[start:end], self.weights[start:end]
+
+    def addVertex(self, vertex):
+        raise TypeError("CSRGraph is frozen, build a Graph and convert it with CSRGraph.fromGraph.")
+
+    def addEdge(self, vertex1, vertex2, weight=1.0):
+        raise TypeError("CSRGraph is frozen, build a Graph and convert it with CSRGraph.fromGraph.")
+
+    def findEdge(self, vertex1, vertex2) -> list | None:
+        """Same [weight, vertex1, vertex2] form as Graph.findEdge, O(degree)"""
+        targets, weights = self.neighbors(self.index[vertex1])
+        found = np.flatnonzero(targets == self.index[vertex2])
+        if len(found):
+            return [float(weights[found[0]]), vertex1, vertex2]
+
+    def bfs(self, startVert):
+        """
+        This method for BFS prints out the order of landmarks visited
+        """
+        visited = bytearray(len(self.vertices))
+        start = self.index[startVert]
+        visited[start] = 1
+        notVisited = deque([start])
+        while notVisited:
+            vert = notVisited.popleft()
+            print(self.vertices[vert])
+            for adjVert in self.neighbors(vert)[0].tolist():
+                if not visited[adjVert]:
+                    notVisited.append(adjVert)
+                    visited[adjVert] = 1
+
+    def dfs(self, startVert):
+        """
+        This method for DFS is using a stack to print out the order of landmarks visited
+        """
+        visited = bytearray(len(self.vertices))
+        start = self.index[startVert]
+        visited[start] = 1
+        notVisited = [start]
+        while notVisited:
+            vert = notVisited.pop()
+            print(self.vertices[vert])
+            for adjVert in self.neighbors(vert)[0].tolist():
+                if not visited[adjVert]:
+                    notVisited.append(adjVert)
+                    visited[adjVert] = 1
+
+    def dijkstraIds(self, start: int, target: int = -1) -> tuple[list[float], list[int]]:
+        """
+        Dijkstra over vertex ids, returns (distances, predecessors) as lists indexed by id.
+        Predecessors are recorded when a distance improves, and the search stops once target is settled.
+        """
+        dists = [float("inf")] * len(self.vertices)
+        predecessors = [-1] * len(self.vertices)
+        visited = bytearray(len(self.vertices))
+        dists[start] = 0.0
+        pq = [(0.0, start)]
+        # memoryviews hand back plain Python numbers, much cheaper than numpy scalars per edge
+        offsets = memoryview(self.offsets)
+        targets = memoryview(self.targets)
+        weights = memoryview(self.weights)
+        pushes = pops = scanned = 0
+        with metrics.span("dijkstra"):
+            while pq:
+                currentDistance, vertex = heappop(pq)
+                pops += 1
+                if visited[vertex]:
+                    continue
+                visited[vertex] = 1
+                if vertex == target:
+                    break
+                begin, end = offsets[vertex], offsets[vertex + 1]
+                scanned += end - begin
+                for adjacentVertex, dist in zip(targets[begin:end], weights[begin:end]):
+                    newDistance = currentDistance + dist
+                    if newDistance < dists[adjacentVertex]:
+                        dists[adjacentVertex] = newDistance
+                        predecessors[adjacentVertex] = vertex
+                        heappush(pq, (newDistance, adjacentVertex))
+                        pushes += 1
+        metrics.count("dijkstra.heapPushes", pushes + 1)
+        metrics.count("dijkstra.heapPops", pops)
+        metrics.count("dijkstra.edgesScanned", scanned)
+        return dists, predecessors
+
+    def dijkstra(self, startVert) -> dict:
+        """
+        Dijkstra used to find the shortest distance to vertices from the start vertex.
+        """
+        if startVert not in self.index:
+            raise ValueError("Both vertices must exist in the graph.")
+        dists, _ = self.dijkstraIds(self.index[startVert])
+        return dict(zip(self.vertices, dists))
+
+    def route(self, startVert, endVert) -> list:
+        """
+        Shortest path between two vertices, Dijkstra stops as soon as the end is settled.
+        """
+        if startVert not in self.index or endVert not in self.index:
+            raise ValueError("Both vertices must exist in the graph.")
+        end = self.index[endVert]
+        dists, predecessors = self.dijkstraIds(self.index[startVert], end)
+        if dists[end] == float("inf"):
+            return []
+        # back trace steps from end
+        path = []
+        vert = end
+        while vert != -1:
+            path.append(self.vertices[vert])
+            vert = predecessors[vert]
+        path.reverse()
+        return path
+
+
+def componentRoots(n: int, sources: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    """
+    Connected components of vertex ids 0..n-1 over the edges sources[i] - targets[i], as the smallest id in each
+    vertex's component. Union find done a whole edge list at a time: every edge between two components hooks the larger
+    root onto the smaller, then pointers are jumped until each vertex points at its root.
+    Time complexity: O((n + edges) log n) on typical graphs, all numpy
+    """
+    parent = np.arange(n)
+    while True:
+        rootA, rootB = parent[sources], parent[targets]
+        between = rootA != rootB
+        if not between.any():
+            return parent
+        rootA, rootB = rootA[between], rootB[between]
+        np.minimum.at(parent, np.maximum(rootA, rootB), np.minimum(rootA, rootB))
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+
+
+class CandidateGraph(CSRGraph):
+    """
+    Sparse pin graph for pin sets too big for the complete graph: each vertex only gets edges to its k nearest
+    vertices by location, kept in CSR form so memory grows as O(n k) instead of O(n^2).
+    - the distance between any two vertices is still exact on demand (findEdge, distanceMatrix)
+    - clusters the k nearest edges leave apart are joined by their shortest connecting edge, so the graph is
+      connected and the MST spans every vertex
+    """
+
+    def __init__(self, vertices: Sequence[Vertex], locations: Sequence[Sequence[float]], k: int = 10):
+        self.k = k
+        self.locations = np.asarray(locations, dtype=np.float64).reshape(-1, 2)
+        # nearest[i] are the ids of the k closest vertices to vertex i, closest first (candidate lists)
+        self.nearest: np.ndarray = kNearest(self.locations, k)
+        n = len(self.locations)
+        sources = np.repeat(np.arange(n, dtype=np.int64), self.nearest.shape[1])
+        targets = self.nearest.ravel()
+        # j in i's list and i in j's list is the same edge
+        keys = np.sort(np.minimum(sources, targets) * n + np.maximum(sources, targets))
+        keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+        sources, targets = self.connectComponents(keys // n, keys % n)
+        weights = np.hypot(*(self.locations[sources] - self.locations[targets]).T)
+        super().__init__(vertices, sources, targets, weights)
+
+    def connectComponents(
+        self, sources: np.ndarray, targets: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Add edges until the vertex ids are connected (Boruvka rounds): every component but the largest gets its
+        shortest edge to another component, which at least halves the number of components each round.
+        Time complexity: O(n) per vertex outside the largest component, only the distances to the rest are computed
+        """
+        n = len(self.locations)
+        while n > 1:
+            labels = componentRoots(n, sources, targets)
+            sizes = np.bincount(labels, minlength=n)
+            components = np.flatnonzero(sizes)
+            if len(components) == 1:
+                break
+
+            newSources, newTargets = [], []
+            largest = int(np.argmax(sizes))
+            for component in components.tolist():
+                if component == largest:
+                    continue
+                members = np.flatnonzero(labels == component)
+                others = np.flatnonzero(labels != component)
+                best = (np.inf, -1, -1)
+                for begin in range(0, len(members), 256):
+                    block = members[begin : begin + 256]
+                    d = pairwiseDistances(self.locations[block], self.locations[others])
+                    row, col = np.unravel_index(np.argmin(d), d.shape)
+                    if d[row, col] < best[0]:
+                        best = (d[row, col], block[row], others[col])
+                newSources.append(best[1])
+                newTargets.append(best[2])
+            sources = np.concatenate((sources, newSources))
+            targets = np.concatenate((targets, newTargets))
+        return sources, targets
+
+    def findEdge(self, vertex1, vertex2) -> list | None:
+        """Exact distance between any two vertices, candidate edge or not, same [weight, vertex1, vertex2] form"""
+        if vertex1 == vertex2:
+            return None
+        x1, y1 = self.locations[self.index[vertex1]].tolist()
+        x2, y2 = self.locations[self.index[vertex2]].tolist()
+        return [hypot(x1 - x2, y1 - y2), vertex1, vertex2]
+
+    def distanceMatrix(self, vertices: Sequence[Vertex] | None = None) -> np.ndarray:
+        """Exact distances between the vertices asked for (all of them if None, O(n^2) memory so keep it small)."""
+        if vertices is None:
+            return pairwiseDistances(self.locations)
+        rows = np.array([self.index[vert] for vert in vertices], dtype=np.int64)
+        return pairwiseDistances(self.locations[rows])
+
+    def minWeightMatching(
+        self,
+        vertices: Sequence[Vertex] | None = None,
+        greedy: bool = False,
+        neighbors: int | None = None,
+        stop: Callable[[], bool] | None = None,
+    ) -> list[tuple[float, Vertex, Vertex]]:
+        """
+        Graph.minWeightMatching on a k nearest graph of just the given vertices (the odd vertices of an MST are
+        rarely each other's candidates in this graph). Vertices left unmatched are matched among themselves.
+        """
+        if vertices is None:
+            vertices = self.vertices
+        if len(vertices) < 2:
+            return []
+        rows = [self.index[vert] for vert in vertices]
+        subgraph = CandidateGraph(vertices, self.locations[rows], self.k)
+        result = Graph.minWeightMatching(subgraph, vertices, greedy, neighbors, stop)
+        matched = {vert for _, vertex1, vertex2 in result for vert in (vertex1, vertex2)}
+        unmatched = [vert for vert in vertices if vert not in matched]
+        if len(unmatched) > 1:
+            result += subgraph.minWeightMatching(unmatched, greedy, stop=stop)
+        return result
+
+    def minimumSpanningTree(self) -> Graph:
+        # O(n k) edges, always sparse
+        return self.kruskal()
+
+
+def pairwiseDistances(locations: np.ndarray, others: np.ndarray | None = None) -> np.ndarray:
+    """Euclidean distance between every pair of (x, y) rows as an n x n matrix (n x m against others)."""
+    if others is None:
+        others = locations
+    x = locations[:, 0]
+    y = locations[:, 1]
+    return np.hypot(x[:, None] - others[None, :, 0], y[:, None] - others[None, :, 1])
+
+
+def euclideanHeuristic(
+    locations: Mapping[Vertex, Sequence[float]],
+) -> Callable[[Vertex, Vertex], float]:
+    """A* heuristic from (x, y) locations: straight line distance never overestimates a route between them."""
+
+    def heuristic(vertex: Vertex, target: Vertex) -> float:
+        x1, y1 = locations[vertex]
+        x2, y2 = locations[target]
+        return hypot(x2 - x1, y2 - y1)
+
+    return heuristic
+
+
+def primTree(dist: np.ndarray) -> tuple[float, np.ndarray]:
+    """
+    Minimum spanning tree of a dense matrix with Prim's algorithm, one vectorized relaxation per added vertex.
+    Returns the tree cost and parent array (-1 for the root, and for the root of each extra component if
+    some entries are inf).
+    Time complexity: O(n^2)
+    """
+    n = len(dist)
+    parent = np.full(n, -1, dtype=np.int64)
+    if n <= 1:
+        return 0.0, parent
+    inTree = np.zeros(n, dtype=bool)
+    inTree[0] = True
+    key = dist[0].copy()
+    key[0] = np.inf
+    parent[1:] = 0
+    total = 0.0
+    for _ in range(n - 1):
+        vert = int(np.argmin(np.where(inTree, np.inf, key)))
+        if inTree[vert]:
+            # every key left is inf (argmin fell back to index 0), take any vertex not in the tree
+            vert = int(np.argmin(inTree))
+        if np.isinf(key[vert]):
+            # nothing left is reachable, start a new component
+            parent[vert] = -1
+        else:
+            total += float(key[vert])
+        inTree[vert] = True
+        closer = (dist[vert] < key) & ~inTree
+        key = np.where(closer, dist[vert], key)
+        parent = np.where(closer, vert, parent)
+    return total, parent
+
+
+def maxWeightMatching(
+    edges: list[tuple[int, int, int]],
+    maxCardinality: bool = False,
+    stop: Callable[[], bool] | None = None,
+) -> list[int]:
+    """
+    Edmonds' blossom algorithm for a maximum weight matching on a general graph, O(n^3).
+    Vertices are 0..n-1 and edges are (i, j, weight) with integer weights so the duals stay exact.
+    maxCardinality: only consider matchings with the most edges possible (perfect on complete graphs w/ even n).
+    Returns mate where mate[v] is the vertex matched to v or -1.
+    stop: checked before every stage (O(n^2) each), SolveCancelled is raised once it returns True
+
+    Based on the primal-dual method in Galil, "Efficient algorithms for finding maximum matching in graphs"
+    and the well known reference implementation by Joris van Rantwijk.
+    """
+    if not edges:
+        return []
+
+    edgeCount = len(edges)
+    vertexCount = 0
+    for i, j, _ in edges:
+        vertexCount = max(vertexCount, i + 1, j + 1)
+    maxWeight = max(0, max(weight for _, _, weight in edges))
+
+    # edge k has endpoints 2k and 2k+1, endpoint[p] is the vertex at endpoint p
+    endpoint = [edges[p // 2][p % 2] for p in range(2 * edgeCount)]
+    # neighborEnds[v] are the remote endpoints of the edges touching v
+    neighborEnds: list[list[int]] = [[] for _ in range(vertexCount)]
+    for k, (i, j, _) in enumerate(edges):
+        neighborEnds[i].append(2 * k + 1)
+        neighborEnds[j].append(2 * k)
+
+    # mate[v] is the remote endpoint of v's matched edge or -1
+    mate = vertexCount * [-1]
+    # top level blossom labels: 0 free, 1 S (outer), 2 T (inner)
+    label = (2 * vertexCount) * [0]
+    # endpoint through which a labeled blossom got its label
+    labelEnd = (2 * vertexCount) * [-1]
+    # top level blossom each vertex belongs to
+    inBlossom = list(range(vertexCount))
+    # blossoms are numbered vertexCount..2*vertexCount-1
+    blossomParent = (2 * vertexCount) * [-1]
+    blossomChildren: list[list[int] | None] = (2 * vertexCount) * [None]
+    blossomBase = list(range(vertexCount)) + vertexCount * [-1]
+    # endpoints of the edges connecting consecutive children of a blossom
+    blossomEndpoints: list[list[int] | None] = (2 * vertexCount) * [None]
+    # least slack edge to a different S blossom
+    bestEdge = (2 * vertexCount) * [-1]
+    blossomBestEdges: list[list[int] | None] = (2 * vertexCount) * [None]
+    unusedBlossoms = list(range(vertexCount, 2 * vertexCount))
+    # vertex duals start at maxWeight, blossom duals at 0
+    dualVar = vertexCount * [maxWeight] + vertexCount * [0]
+    # edges known to have zero slack
+    allowEdge = edgeCount * [False]
+    queue: list[int] = []
+
+    doubleWeight = [2 * weight for _, _, weight in edges]
+
+    def slack(k: int) -> int:
+        i, j, _ = edges[k]
+        return dualVar[i] + dualVar[j] - doubleWeight[k]
+
+    def blossomLeaves(b: int):
+        if b < vertexCount:
+            yield b
+        else:
+            for child in blossomChildren[b]:
+                if child < vertexCount:
+                    yield child
+                else:
+                    yield from blossomLeaves(child)
+
+    def assignLabel(w: int, t: int, p: int) -> None:
+        b = inBlossom[w]
+        label[w] = label[b] = t
+        labelEnd[w] = labelEnd[b] = p
+        bestEdge[w] = bestEdge[b] = -1
+        if t == 1:
+            # b became an S blossom, scan its vertices
+            queue.extend(blossomLeaves(b))
+        elif t == 2:
+            # b became a T blossom, label its mate S
+            base = blossomBase[b]
+            assignLabel(endpoint[mate[base]], 1, mate[base] ^ 1)
+
+    def scanBlossom(v: int, w: int) -> int:
+        """Trace back from v and w to find a new blossom (returns its base) or an augmenting path (-1)."""
+        path = []
+        base = -1
+        while v != -1 or w != -1:
+            b = inBlossom[v]
+            if label[b] & 4:
+                base = blossomBase[b]
+                break
+            path.append(b)
+            label[b] = 5
+            if labelEnd[b] == -1:
+                # reached the root of the alternating tree
+                v = -1
+            else:
+                v = endpoint[labelEnd[b]]
+                b = inBlossom[v]
+                v = endpoint[labelEnd[b]]
+            # alternate between the two paths
+            if w != -1:
+                v, w = w, v
+        for b in path:
+            label[b] = 1
+        return base
+
+    def addBlossom(base: int, k: int) -> None:
+        v, w, _ = edges[k]
+        baseBlossom = inBlossom[base]
+        bv = inBlossom[v]
+        bw = inBlossom[w]
+        b = unusedBlossoms.pop()
+        blossomBase[b] = base
+        blossomParent[b] = -1
+        blossomParent[baseBlossom] = b
+        blossomChildren[b] = path = []
+        blossomEndpoints[b] = endps = []
+        # trace back from v to base
+        while bv != baseBlossom:
+            blossomParent[bv] = b
+            path.append(bv)
+            endps.append(labelEnd[bv])
+            v = endpoint[labelEnd[bv]]
+            bv = inBlossom[v]
+        path.append(baseBlossom)
+        path.reverse()
+        endps.reverse()
+        endps.append(2 * k)
+        # trace back from w to base
+        while bw != baseBlossom:
+            blossomParent[bw] = b
+            path.append(bw)
+            endps.append(labelEnd[bw] ^ 1)
+            w = endpoint[labelEnd[bw]]
+            bw = inBlossom[w]
+        label[b] = 1
+        labelEnd[b] = labelEnd[baseBlossom]
+        dualVar[b] = 0
+        # relabel vertices, former T vertices become S and need scanning
+        for leaf in blossomLeaves(b):
+            if label[inBlossom[leaf]] == 2:
+                queue.append(leaf)
+            inBlossom[leaf] = b
+        # merge the least slack edges of the sub-blossoms
+        bestEdgeTo = (2 * vertexCount) * [-1]
+        for child in path:
+            if blossomBestEdges[child] is None:
+                neighborLists = [
+                    [p // 2 for p in neighborEnds[leaf]] for leaf in blossomLeaves(child)
+                ]
+            else:
+                neighborLists = [blossomBestEdges[child]]
+            for neighborList in neighborLists:
+                for edge in neighborList:
+                    i, j, _ = edges[edge]
+                    if inBlossom[j] == b:
+                        i, j = j, i
+                    bj = inBlossom[j]
+                    if (
+                        bj != b
+                        and label[bj] == 1
+                        and (bestEdgeTo[bj] == -1 or slack(edge) < slack(bestEdgeTo[bj]))
+                    ):
+                        bestEdgeTo[bj] = edge
+            blossomBestEdges[child] = None
+            bestEdge[child] = -1
+        blossomBestEdges[b] = [edge for edge in bestEdgeTo if edge != -1]
+        bestEdge[b] = -1
+        for edge in blossomBestEdges[b]:
+            if bestEdge[b] == -1 or slack(edge) < slack(bestEdge[b]):
+                bestEdge[b] = edge
+
+    def expandBlossom(b: int, endStage: bool) -> None:
+        # turn the children into top level blossoms
+        for child in blossomChildren[b]:
+            blossomParent[child] = -1
+            if child < vertexCount:
+                inBlossom[child] = child
+            elif endStage and dualVar[child] == 0:
+                expandBlossom(child, endStage)
+            else:
+                for leaf in blossomLeaves(child):
+                    inBlossom[leaf] = child
+        # an expanded T blossom needs its children relabeled along the even path
+        if not endStage and label[b] == 2:
+            entryChild = inBlossom[endpoint[labelEnd[b] ^ 1]]
+            j = blossomChildren[b].index(entryChild)
+            if j & 1:
+                j -= len(blossomChildren[b])
+                jStep = 1
+                endTrick = 0
+            else:
+                jStep = -1
+                endTrick = 1
+            p = labelEnd[b]
+            while j != 0:
+                label[endpoint[p ^ 1]] = 0
+                label[endpoint[blossomEndpoints[b][j - endTrick] ^ endTrick ^ 1]] = 0
+                assignLabel(endpoint[p ^ 1], 2, p)
+                allowEdge[blossomEndpoints[b][j - endTrick] // 2] = True
+                j += jStep
+                p = blossomEndpoints[b][j - endTrick] ^ endTrick
+                allowEdge[p // 2] = True
+                j += jStep
+            # the base child becomes T without relabeling its mate
+            child = blossomChildren[b][j]
+            label[endpoint[p ^ 1]] = label[child] = 2
+            labelEnd[endpoint[p ^ 1]] = labelEnd[child] = p
+            bestEdge[child] = -1
+            # children on the odd path may have been reached from outside
+            j += jStep
+            while blossomChildren[b][j] != entryChild:
+                child = blossomChildren[b][j]
+                if label[child] == 1:
+                    j += jStep
+                    continue
+                reached = -1
+                for leaf in blossomLeaves(child):
+                    if label[leaf] != 0:
+                        reached = leaf
+                        break
+                if reached != -1:
+                    label[reached] = 0
+                    label[endpoint[mate[blossomBase[child]]]] = 0
+                    assignLabel(reached, 2, labelEnd[reached])
+                j += jStep
+        label[b] = labelEnd[b] = -1
+        blossomChildren[b] = blossomEndpoints[b] = None
+        blossomBase[b] = -1
+        blossomBestEdges[b] = None
+        bestEdge[b] = -1
+        unusedBlossoms.append(b)
+
+    def augmentBlossom(b: int, v: int) -> None:
+        """Swap matched/unmatched edges in blossom b along the path from v to the base."""
+        t = v
+        while blossomParent[t] != b:
+            t = blossomParent[t]
+        if t >= vertexCount:
+            augmentBlossom(t, v)
+        i = j = blossomChildren[b].index(t)
+        if i & 1:
+            j -= len(blossomChildren[b])
+            jStep = 1
+            endTrick = 0
+        else:
+            jStep = -1
+            endTrick = 1
+        while j != 0:
+            j += jStep
+            t = blossomChildren[b][j]
+            p = blossomEndpoints[b][j - endTrick] ^ endTrick
+            if t >= vertexCount:
+                augmentBlossom(t, endpoint[p])
+            j += jStep
+            t = blossomChildren[b][j]
+            if t >= vertexCount:
+                augmentBlossom(t, endpoint[p ^ 1])
+            mate[endpoint[p]] = p ^ 1
+            mate[endpoint[p ^ 1]] = p
+        # rotate so the new base comes first
+        blossomChildren[b] = blossomChildren[b][i:] + blossomChildren[b][:i]
+        blossomEndpoints[b] = blossomEndpoints[b][i:] + blossomEndpoints[b][:i]
+        blossomBase[b] = blossomBase[blossomChildren[b][0]]
+
+    def augmentMatching(k: int) -> None:
+        """Flip the augmenting path through edge k back to both tree roots."""
+        v, w, _ = edges[k]
+        for s, p in ((v, 2 * k + 1), (w, 2 * k)):
+            while True:
+                bs = inBlossom[s]
+                if bs >= vertexCount:
+                    augmentBlossom(bs, s)
+                mate[s] = p
+                if labelEnd[bs] == -1:
+                    # reached a single vertex root
+                    break
+                t = endpoint[labelEnd[bs]]
+                bt = inBlossom[t]
+                s = endpoint[labelEnd[bt]]
+                j = endpoint[labelEnd[bt] ^ 1]
+                if bt >= vertexCount:
+                    augmentBlossom(bt, j)
+                mate[j] = labelEnd[bt]
+                p = labelEnd[bt] ^ 1
+
+    # each stage finds one augmenting path
+    for _ in range(vertexCount):
+        if stop is not None and stop():
+            raise SolveCancelled
+        label[:] = (2 * vertexCount) * [0]
+        bestEdge[:] = (2 * vertexCount) * [-1]
+        blossomBestEdges[vertexCount:] = vertexCount * [None]
+        allowEdge[:] = edgeCount * [False]
+        queue[:] = []
+        for v in range(vertexCount):
+            if mate[v] == -1 and label[inBlossom[v]] == 0:
+                assignLabel(v, 1, -1)
+
+        augmented = False
+        while True:
+            # grow the alternating forest from S vertices
+            while queue and not augmented:
+                v = queue.pop()
+                for p in neighborEnds[v]:
+                    k = p // 2
+                    w = endpoint[p]
+                    if inBlossom[v] == inBlossom[w]:
+                        continue
+                    if not allowEdge[k]:
+                        # inlined slack(k), this is the hot loop
+                        kSlack = dualVar[v] + dualVar[w] - doubleWeight[k]
+                        if kSlack <= 0:
+                            allowEdge[k] = True
+                    if allowEdge[k]:
+                        if label[inBlossom[w]] == 0:
+                            assignLabel(w, 2, p ^ 1)
+                        elif label[inBlossom[w]] == 1:
+                            base = scanBlossom(v, w)
+                            if base >= 0:
+                                addBlossom(base, k)
+                            else:
+                                augmentMatching(k)
+                                augmented = True
+                                break
+                        elif label[w] == 0:
+                            label[w] = 2
+                            labelEnd[w] = p ^ 1
+                    elif label[inBlossom[w]] == 1:
+                        b = inBlossom[v]
+                        if bestEdge[b] == -1 or kSlack < slack(bestEdge[b]):
+                            bestEdge[b] = k
+                    elif label[w] == 0:
+                        if bestEdge[w] == -1 or kSlack < slack(bestEdge[w]):
+                            bestEdge[w] = k
+
+            if augmented:
+                break
+
+            # no tight edge left, pick the smallest dual adjustment
+            deltaType = -1
+            delta = deltaEdge = deltaBlossom = None
+            if not maxCardinality:
+                deltaType = 1
+                delta = min(dualVar[:vertexCount])
+            for v in range(vertexCount):
+                if label[inBlossom[v]] == 0 and bestEdge[v] != -1:
+                    d = slack(bestEdge[v])
+                    if deltaType == -1 or d < delta:
+                        delta = d
+                        deltaType = 2
+                        deltaEdge = bestEdge[v]
+            for b in range(2 * vertexCount):
+                if blossomParent[b] == -1 and label[b] == 1 and bestEdge[b] != -1:
+                    d = slack(bestEdge[b]) // 2
+                    if deltaType == -1 or d < delta:
+                        delta = d
+                        deltaType = 3
+                        deltaEdge = bestEdge[b]
+            for b in range(vertexCount, 2 * vertexCount):
+                if (
+                    blossomBase[b] >= 0
+                    and blossomParent[b] == -1
+                    and label[b] == 2
+                    and (deltaType == -1 or dualVar[b] < delta)
+                ):
+                    delta = dualVar[b]
+                    deltaType = 4
+                    deltaBlossom = b
+            if deltaType == -1:
+                # no further improvement possible, the matching has max cardinality
+                deltaType = 1
+                delta = max(0, min(dualVar[:vertexCount]))
+
+            for v in range(vertexCount):
+                if label[inBlossom[v]] == 1:
+                    dualVar[v] -= delta
+                elif label[inBlossom[v]] == 2:
+                    dualVar[v] += delta
+            for b in range(vertexCount, 2 * vertexCount):
+                if blossomBase[b] >= 0 and blossomParent[b] == -1:
+                    if label[b] == 1:
+                        dualVar[b] += delta
+                    elif label[b] == 2:
+                        dualVar[b] -= delta
+
+            if deltaType == 1:
+                # optimum reached
+                break
+            elif deltaType == 2:
+                allowEdge[deltaEdge] = True
+                i, j, _ = edges[deltaEdge]
+                if label[inBlossom[i]] == 0:
+                    i, j = j, i
+                queue.append(i)
+            elif deltaType == 3:
+                allowEdge[deltaEdge] = True
+                i, j, _ = edges[deltaEdge]
+                queue.append(i)
+            elif deltaType == 4:
+                expandBlossom(deltaBlossom, False)
+
+        if not augmented:
+            break
+
+        # expand S blossoms with zero dual at the end of the stage
+        for b in range(vertexCount, 2 * vertexCount):
+            if (
+                blossomParent[b] == -1
+                and blossomBase[b] >= 0
+                and label[b] == 1
+                and dualVar[b] == 0
+            ):
+                expandBlossom(b, True)
+
+    for v in range(vertexCount):
+        if mate[v] >= 0:
+            mate[v] = endpoint[mate[v]]
+    return mate
 
 if __name__ == "__main__":
     # Sample graph with 5 vertices all interconnected.
@@ -0,0 +1,136 @@
+"""
+Timers and counters the solvers report into, to see which phase of a solve the time goes to.
+
+    from Metrics import metrics
+    with metrics.recording():
+        graph.christofidesRoute()
+        print(metrics.summary())
+
+Recording is off unless the ROADTRIP_METRICS environment variable is set or recording() / enable() turn it on.
+While off, span() hands back a shared do-nothing context and count() returns straight away. Hot loops keep their
+counts in locals and report them once at the end, so leaving the hooks in costs nothing measurable.
+"""
+
+import json
+import os
+import threading
+from contextlib import contextmanager, nullcontext
+from time import perf_counter
+from typing import Iterator
+
+# what span() returns while disabled
+NO_SPAN = nullcontext()
+
+
+class Metrics:
+    """
+    Per-phase timings and running counters.
+    Spans nest and are keyed by their path ("christofides/matching"). Counters are dotted names
+    ("dijkstra.heapPushes"). Both are totals over everything recorded since the last reset().
+    Safe to report into from several threads, each thread keeps its own span nesting.
+    Counts made in worker processes (parallel branch and bound) stay in those processes.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        # span path -> [calls, total seconds, longest call]
+        self.spans: dict[str, list[float]] = {}
+        self.counters: dict[str, float] = {}
+        self.started = perf_counter()
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def reset(self) -> None:
+        with self.lock:
+            self.spans = {}
+            self.counters = {}
+            self.started = perf_counter()
+
+    def span(self, name: str):
+        """Context manager timing one phase, nested inside whichever span this thread is in."""
+        if not self.enabled:
+            return NO_SPAN
+        return self.timed(name)
+
+    @contextmanager
+    def timed(self, name: str) -> Iterator[None]:
+        stack = getattr(self.local, "stack", None)
+        if stack is None:
+            stack = self.local.stack = []
+        stack.append(name)
+        path = "/".join(stack)
+        startTime = perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = perf_counter() - startTime
+            stack.pop()
+            with self.lock:
+                record = self.spans.get(path)
+                if record is None:
+                    self.spans[path] = [1, elapsed, elapsed]
+                else:
+                    record[0] += 1
+                    record[1] += elapsed
+                    record[2] = max(record[2], elapsed)
+
+    def count(self, name: str, amount: float = 1) -> None:
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    @contextmanager
+    def recording(self) -> Iterator["Metrics"]:
+        """Record (from a clean slate) for the duration of the block, then go back to the previous setting."""
+        wasEnabled = self.enabled
+        self.reset()
+        self.enabled = True
+        try:
+            yield self
+        finally:
+            self.enabled = wasEnabled
+
+    def report(self) -> dict:
+        """Everything recorded so far as plain JSON ready data."""
+        with self.lock:
+            return {
+                "elapsed": perf_counter() - self.started,
+                "spans": {
+                    path: {"calls": calls, "seconds": total, "maxSeconds": longest}
+                    for path, (calls, total, longest) in sorted(self.spans.items())
+                },
+                "counters": dict(sorted(self.counters.items())),
+            }
+
+    def toJSON(self, indent: int | None = None) -> str:
+        return json.dumps(self.report(), indent=indent)
+
+    def write(self, path: str) -> None:
+        """Append the report as one JSON line to the file at path."""
+        with open(path, "a") as file:
+            file.write(self.toJSON() + "\n")
+
+    def summary(self) -> str:
+        """Report as indented text lines, spans first then counters."""
+        report = self.report()
+        lines = []
+        for path, span in report["spans"].items():
+            depth = path.count("/")
+            name = path.rsplit("/", 1)[-1]
+            lines.append(
+                f"{'  ' * depth}{name}: {span['seconds']:9.6f} s over {span['calls']} call(s)"
+            )
+        for name, value in report["counters"].items():
+            lines.append(f"{name}: {value:g}")
+        return "\n".join(lines)
+
+
+# shared by every solver, turned on from the environment so it can be used without code changes
+metrics = Metrics(bool(os.environ.get("ROADTRIP_METRICS")))
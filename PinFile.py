@@ -0,0 +1,158 @@
+"""
+Binary pin set and route files.
+
+Pin set (.pins), little endian:
+    header  32 bytes: magic b"RTPINS01", version u16, flags u16, padding u32, count u64, start i64 (-1 for none)
+    coords  count x 2 float64 (x, y), starts 8 byte aligned right after the header so it can be memory mapped
+    labels  only with flags & HAS_LABELS: (count + 1) u64 offsets into the UTF-8 text that follows them
+
+Route (.route), same style:
+    header  32 bytes: magic b"RTROUT01", version u16, flags u16, method length u32, count u64, distance f64
+    route   count u32 pin indices in visiting order (closed routes repeat the start at the end)
+    method  UTF-8 name of the method that made it
+
+Loading maps the file instead of reading it, so a million pins load in milliseconds. The coordinates go to the graph
+builders as one numpy array, and the k nearest candidate graph used past Route.SPARSE_GRAPH_PINS is built with numpy
+(Spatial.kNearest) without a Python object per pin. The tour solvers still keep per pin Python lists once a solve
+starts.
+"""
+
+import struct
+from typing import Sequence
+
+import numpy as np
+
+PINS_MAGIC = b"RTPINS01"
+ROUTE_MAGIC = b"RTROUT01"
+VERSION = 1
+HAS_LABELS = 1
+PINS_HEADER = struct.Struct("<8sHHIQq")
+ROUTE_HEADER = struct.Struct("<8sHHIQd")
+
+
+def isPinFile(path: str) -> bool:
+    """True if path starts like a binary pin set (text pin files don't)."""
+    with open(path, "rb") as file:
+        return file.read(len(PINS_MAGIC)) == PINS_MAGIC
+
+
+class PinSet:
+    """
+    Pins loaded from a .pins file: locations (n x 2 float64, read only and memory mapped unless loaded with
+    mmap=False), start index or None, and labels decoded only when asked for.
+    """
+
+    def __init__(
+        self,
+        locations: np.ndarray,
+        start: int | None = None,
+        labelOffsets: np.ndarray | None = None,
+        labelText: bytes | np.ndarray | None = None,
+    ):
+        self.locations = locations
+        self.start = start
+        self.labelOffsets = labelOffsets
+        self.labelText = labelText
+
+    def __len__(self) -> int:
+        return len(self.locations)
+
+    def label(self, i: int) -> str | None:
+        if self.labelOffsets is None:
+            return None
+        return bytes(self.labelText[self.labelOffsets[i] : self.labelOffsets[i + 1]]).decode()
+
+    @property
+    def labels(self) -> list[str] | None:
+        """Every label, one Python string per pin so only for when they're all needed."""
+        if self.labelOffsets is None:
+            return None
+        text = bytes(self.labelText)
+        offsets = self.labelOffsets.tolist()
+        return [text[a:b].decode() for a, b in zip(offsets, offsets[1:])]
+
+
+def writePins(
+    path: str,
+    locations,
+    labels: Sequence[str] | None = None,
+    start: int | None = None,
+) -> None:
+    """Save (x, y) locations (any n x 2 array like) with optional per pin labels and start index."""
+    coords = np.ascontiguousarray(np.asarray(locations, dtype="<f8").reshape(-1, 2))
+    n = len(coords)
+    if labels is not None and len(labels) != n:
+        raise ValueError(f"{len(labels)} labels for {n} pins")
+    if start is not None and not 0 <= start < n:
+        raise ValueError(f"Start {start} is not one of the {n} pins")
+    flags = HAS_LABELS if labels is not None else 0
+    with open(path, "wb") as file:
+        file.write(PINS_HEADER.pack(PINS_MAGIC, VERSION, flags, 0, n, -1 if start is None else start))
+        file.write(coords.tobytes())
+        if labels is not None:
+            encoded = [label.encode() for label in labels]
+            offsets = np.zeros(n + 1, dtype="<u8")
+            np.cumsum([len(label) for label in encoded], out=offsets[1:])
+            file.write(offsets.tobytes())
+            file.write(b"".join(encoded))
+
+
+def readPins(path: str, mmap: bool = True) -> PinSet:
+    """
+    Load a .pins file. With mmap the coordinates (and labels) are views of the mapped file, pages are only read as
+    they're touched, otherwise the file is read into memory in one go.
+    """
+    with open(path, "rb") as file:
+        header = file.read(PINS_HEADER.size)
+    if len(header) < PINS_HEADER.size:
+        raise ValueError(f"{path} is too short to be a pin file")
+    magic, version, flags, _, n, start = PINS_HEADER.unpack(header)
+    if magic != PINS_MAGIC:
+        raise ValueError(f"{path} is not a pin file")
+    if version > VERSION:
+        raise ValueError(f"{path} is pin file version {version}, only up to {VERSION} is supported")
+
+    if mmap:
+        data = np.memmap(path, dtype=np.uint8, mode="r")
+    else:
+        data = np.fromfile(path, dtype=np.uint8)
+    coordsEnd = PINS_HEADER.size + 16 * n
+    if len(data) < coordsEnd:
+        raise ValueError(f"{path} is truncated, expected {n} pins")
+    locations = data[PINS_HEADER.size : coordsEnd].view("<f8").reshape(n, 2)
+
+    labelOffsets = labelText = None
+    if flags & HAS_LABELS:
+        offsetsEnd = coordsEnd + 8 * (n + 1)
+        labelOffsets = data[coordsEnd:offsetsEnd].view("<u8")
+        labelText = data[offsetsEnd:]
+        if len(labelOffsets) != n + 1 or int(labelOffsets[-1]) > len(labelText):
+            raise ValueError(f"{path} has truncated labels")
+    return PinSet(locations, None if start < 0 else start, labelOffsets, labelText)
+
+
+def writeRoute(path: str, route: Sequence[int], distance: float, method: str = "") -> None:
+    """Save a route as pin indices with its distance and the method that made it."""
+    indices = np.asarray(route, dtype="<u4")
+    name = method.encode()
+    with open(path, "wb") as file:
+        file.write(ROUTE_HEADER.pack(ROUTE_MAGIC, VERSION, 0, len(name), len(indices), float(distance)))
+        file.write(indices.tobytes())
+        file.write(name)
+
+
+def readRoute(path: str) -> tuple[np.ndarray, float, str]:
+    """Load a .route file as (pin indices, distance, method)."""
+    data = np.fromfile(path, dtype=np.uint8)
+    if len(data) < ROUTE_HEADER.size:
+        raise ValueError(f"{path} is too short to be a route file")
+    magic, version, _, nameLength, n, distance = ROUTE_HEADER.unpack(data[: ROUTE_HEADER.size].tobytes())
+    if magic != ROUTE_MAGIC:
+        raise ValueError(f"{path} is not a route file")
+    if version > VERSION:
+        raise ValueError(f"{path} is route file version {version}, only up to {VERSION} is supported")
+    routeEnd = ROUTE_HEADER.size + 4 * n
+    if len(data) < routeEnd + nameLength:
+        raise ValueError(f"{path} is truncated, expected {n} route stops")
+    route = data[ROUTE_HEADER.size : routeEnd].view("<u4")
+    return route, distance, data[routeEnd : routeEnd + nameLength].tobytes().decode()
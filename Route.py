@@ -0,0 +1,506 @@
+"""
+Routing on plain (x, y) coordinates without the GUI, used by the window, batch runs and anything else that needs routes.
+Nothing here imports tkinter, customtkinter or PIL.
+"""
+
+from itertools import permutations
+from time import time
+from typing import Callable, Sequence
+
+import numpy as np
+
+from Graph import Graph, DenseGraph, CandidateGraph, euclideanHeuristic
+from Metrics import metrics
+from Spatial import nearestNeighborTour, EuclideanDistances
+from Tour import (
+    heldKarp,
+    branchAndBound,
+    parallelBranchAndBound,
+    localSearch,
+    linKernighan,
+    SolveCancelled,
+)
+
+
+type Vertex = int
+
+# point count past which routeGraph builds the sparse k nearest graph instead of the complete one
+SPARSE_GRAPH_PINS = 2000
+# point count from which branch and bound is split over processes, below it process start up isn't worth it
+PARALLEL_SEARCH_PINS = 20
+# most pins heldKarpRoute takes on itself, its tables are O(2^n * n) memory (~80 MB here, ~350 MB at 22)
+HELD_KARP_PINS = 20
+
+
+class RouteGraph(DenseGraph):
+    """
+    Complete graph over (x, y) locations with every routing method, no GUI needed.
+    Vertices can be any ids (pins in the GUI, point indices in batch runs), routes are returned as lists of them.
+    """
+
+    def __init__(
+        self,
+        vertices: Sequence[Vertex],
+        locations: Sequence[Sequence[float]],
+        start: Vertex | None = None,
+    ):
+        # complete graph of the locations, weights are the distances between them
+        super().__init__(vertices, locations)
+        # route start when a method isn't given one, the first vertex if None
+        self.start = start
+        self.mst: Graph | None = None
+        # set by whoever runs a solve on another thread, the long searches check it and raise SolveCancelled
+        self.stop: Callable[[], bool] | None = None
+        # anytime hook, improved(route, distance, elapsed seconds) is called with better routes as they are found
+        self.improved: Callable[[list[Vertex], float, float], None] | None = None
+
+    def defaultStart(self) -> Vertex:
+        if len(self.vertices) <= 0:
+            raise ValueError("Cannot create cycle from 0 pins placed.")
+        return self.vertices[0] if self.start is None else self.start
+
+    def tourDistances(self, neighbors: int) -> tuple[np.ndarray, list[list[int]] | None]:
+        """Distances by vertex id for the tour solvers, candidate lists are left to them on the full matrix."""
+        return self.distanceMatrix(), None
+
+    def reportImproved(self) -> Callable[[list[int], float, float], None] | None:
+        """Wrap self.improved for the tour solvers, which report tours of vertex ids instead of pins."""
+        if self.improved is None:
+            return None
+        improved = self.improved
+        vertices = self.vertices
+
+        def report(tour: list[int], cost: float, elapsed: float) -> None:
+            improved([vertices[i] for i in tour], cost, elapsed)
+
+        return report
+
+    def getMST(self) -> Graph:
+        if not self.mst:
+            return self.setMST()
+        return self.mst
+
+    def setMST(self, mst: Graph | None = None) -> Graph:
+        if not mst:
+            self.mst = self.minimumSpanningTree()
+            return self.mst
+        elif type(mst) is Graph:
+            self.mst = mst
+            return mst
+        else:
+            raise TypeError(f"{type(mst)} is not None or Graph")
+
+    def aStarRoute(self, startVert, endVert, heuristic=None) -> tuple[list, float]:
+        """A* between two vertices, defaults to the straight line distance between their locations as the heuristic."""
+        if heuristic is None:
+            heuristic = euclideanHeuristic(dict(zip(self.vertices, self.locations.tolist())))
+        return super().aStarRoute(startVert, endVert, heuristic)
+
+    def getRouteCost(self, vertices: Sequence[Vertex] | None = None) -> float:
+        """Sum total cost for all existing edges (the total distance travelled w/ current route)"""
+        cost = 0
+        if not vertices:
+            for edge in self.edges:
+                cost += edge[0]
+            return cost
+
+        # O(1) weight lookup per step instead of scanning the adjacency list
+        for i in range(1, len(vertices)):
+            edge = self.findEdge(vertices[i - 1], vertices[i])
+            if edge:
+                cost += edge[0]
+        return cost
+
+    def nearestNeighborRoute(
+        self, startVertex: int | None = None
+    ) -> tuple[list[Vertex], float]:
+        """
+        Get a guess at the optimal route by going to the closest unvisited pin.
+        Time complexity: ~O(n log n)
+        - nearest pins are found with a grid index over the pin locations, visited pins are removed from it
+        - the graph and its distance matrix are left untouched
+        """
+        if startVertex is None:
+            startVertex = self.defaultStart()
+
+        with metrics.span("nearestNeighbor"):
+            tour, distance = nearestNeighborTour(
+                self.locations.tolist(), self.index[startVertex]
+            )
+        return [self.vertices[i] for i in tour], distance
+
+    def bruteForceRoute(
+        self, startVertex: int | None = None
+    ) -> tuple[list[Vertex], float]:
+        """
+        Get the shortest cycle by checking all permutations of paths to compare performance vs efficiency.
+        Time complexity: O((n-1)!/2)
+        - n for each vertex
+        - n-1 due to excluding the start vertex when creating the permutation
+        - (n-1)! for all permutations
+        - dvided by 2 by skipping all reverse permutations
+        Every new best route is passed to self.improved as it is found.
+        """
+        startTime = time()
+        distance = float("inf")
+        route = []
+        if startVertex is None:
+            startVertex = self.defaultStart()
+
+        if len(self.adj_list) <= 0:
+            raise Exception("Missing vertices to construct path")
+
+        # check all permutations of routes
+        intermediaryVertices = set(self.adj_list)
+        intermediaryVertices.remove(startVertex)
+        count = costed = 0
+        for count, r in enumerate(permutations(intermediaryVertices), 1):
+            if self.stop is not None and count % 4096 == 0 and self.stop():
+                raise SolveCancelled
+            # skip reverse routes
+            # from https://stackoverflow.com/questions/960557/how-to-generate-permutations-of-a-list-without-reverse-duplicates-in-python-us
+            # this extended slice reverses the permutation and uses comparison to make sure it is less, so it gets rid of half of perms
+            if r <= r[::-1]:
+                continue
+            # construct cycle from intermediary route and loop back to start
+            newRoute = [startVertex]
+            for v in r:
+                newRoute.append(v)
+            newRoute.append(startVertex)
+
+            newDistance = self.getRouteCost(newRoute)
+            costed += 1
+            if newDistance < distance:
+                route = newRoute
+                distance = newDistance
+                if self.improved is not None:
+                    self.improved(route, distance, time() - startTime)
+
+        metrics.count("bruteForce.permutations", count)
+        metrics.count("bruteForce.routesCosted", costed)
+        return route, distance
+
+    def heldKarpRoute(
+        self, startVertex: int | None = None
+    ) -> tuple[list[Vertex], float]:
+        """
+        Get the shortest cycle exactly with the Held-Karp dynamic program instead of checking every permutation.
+        Time complexity: O(2^n * n^2)
+        - exact tours for 18-22 pins in seconds where brute force is limited to ~11
+        - memory grows as O(2^n * n), so past HELD_KARP_PINS pins the exact route comes from branchAndBoundRoute instead
+          (counted as heldKarp.fallbacks in metrics, nothing is printed so batch and service output stays clean)
+        """
+        if startVertex is None:
+            startVertex = self.defaultStart()
+
+        if len(self.adj_list) <= 0:
+            raise Exception("Missing vertices to construct path")
+
+        if len(self.adj_list) > HELD_KARP_PINS:
+            metrics.count("heldKarp.fallbacks")
+            return self.branchAndBoundRoute(startVertex)
+
+        vertices = list(self.adj_list)
+        with metrics.span("distanceMatrix"):
+            dist = self.distanceMatrix(vertices)
+        with metrics.span("heldKarp"):
+            tour, distance = heldKarp(dist, vertices.index(startVertex), self.stop)
+        route = [vertices[i] for i in tour]
+        return route, distance
+
+    def branchAndBoundRoute(
+        self,
+        startVertex: int | None = None,
+        workers: int | None = None,
+        seed: list[Vertex] | None = None,
+    ) -> tuple[list[Vertex], float]:
+        """
+        Get the shortest cycle exactly with a depth first search that prunes partial routes using an MST lower bound.
+        Starts from the better of the nearest neighbor and Christofides routes so pruning works from the first branch.
+        Worst case is still exponential, but most branches are cut so 25-40 pins are reachable.
+        The seed route and every better one found are passed to self.improved as the search goes.
+        workers: processes to split the search over (all cores by default), from PARALLEL_SEARCH_PINS pins up
+        seed: another route to prune from (e.g. a cached one), used if it beats the usual seeds
+        """
+        if startVertex is None:
+            startVertex = self.defaultStart()
+
+        if len(self.adj_list) <= 0:
+            raise Exception("Missing vertices to construct path")
+
+        vertices = list(self.adj_list)
+        index = {vert: i for i, vert in enumerate(vertices)}
+        with metrics.span("seed"):
+            seeds = [
+                self.nearestNeighborRoute(startVertex),
+                self.christofidesRoute(startVertex),
+            ]
+            if seed:
+                seeds.append((seed, self.getRouteCost(seed)))
+            seedRoute, seedDistance = min(seeds, key=lambda option: option[1])
+        incumbent = ([index[vert] for vert in seedRoute], seedDistance)
+
+        with metrics.span("distanceMatrix"):
+            dist = self.distanceMatrix(vertices)
+        with metrics.span("branchAndBound"):
+            if workers != 1 and len(vertices) >= PARALLEL_SEARCH_PINS:
+                tour, distance = parallelBranchAndBound(
+                    dist,
+                    index[startVertex],
+                    incumbent,
+                    workers,
+                    self.stop,
+                    self.reportImproved(),
+                )
+            else:
+                tour, distance = branchAndBound(
+                    dist, index[startVertex], incumbent, self.stop, self.reportImproved()
+                )
+        route = [vertices[i] for i in tour]
+        return route, distance
+
+    def improveRoute(
+        self,
+        solution: tuple[list[Vertex], float],
+        timeLimit: float | None = 1.0,
+        neighbors: int = 10,
+    ) -> tuple[list[Vertex], float]:
+        """
+        Local search on a (route, distance) from any of the other methods using 2-opt and Or-opt moves.
+        Only tries moves to each pin's closest neighbors and skips pins whose edges haven't changed (don't look bits),
+        so hundreds of pins take milliseconds. Stops after timeLimit seconds (None to run until no move helps).
+        The starting route and the improved route every so often are passed to self.improved.
+        """
+        route, distance = solution
+        if self.improved is not None:
+            self.improved(route, distance, 0.0)
+        with metrics.span("tourDistances"):
+            dist, candidates = self.tourDistances(neighbors)
+        with metrics.span("localSearch"):
+            tour, distance = localSearch(
+                dist,
+                [self.index[vert] for vert in route],
+                neighbors,
+                timeLimit,
+                candidates,
+                self.stop,
+                self.reportImproved(),
+            )
+        return [self.vertices[i] for i in tour], distance
+
+    def linKernighanRoute(
+        self,
+        startVertex: int | None = None,
+        timeLimit: float | None = 5.0,
+        iterations: int | None = None,
+        neighbors: int = 8,
+        route: list[Vertex] | None = None,
+    ) -> tuple[list[Vertex], float]:
+        """
+        Get a near optimal cycle with Lin-Kernighan style variable depth k-opt moves, starting from the nearest neighbor
+        route or the given route (a closed cycle from startVertex, e.g. a cached one).
+        Once no move helps, the route is kicked with a double bridge and searched again until timeLimit seconds or
+        iterations kicks are used up or n kicks in a row found nothing better, keeping the best route found.
+        - usually within a few percent of optimal, a thousand pins take well under a second to reach the first local optimum
+        The starting route and the best route every so often are passed to self.improved.
+        """
+        if startVertex is None:
+            startVertex = self.defaultStart()
+
+        if len(self.adj_list) <= 0:
+            raise Exception("Missing vertices to construct path")
+
+        if route:
+            distance = self.getRouteCost(route)
+        else:
+            route, distance = self.nearestNeighborRoute(startVertex)
+        if self.improved is not None:
+            self.improved(route, distance, 0.0)
+        with metrics.span("tourDistances"):
+            dist, candidates = self.tourDistances(neighbors)
+        with metrics.span("linKernighan"):
+            tour, distance = linKernighan(
+                dist,
+                [self.index[vert] for vert in route],
+                neighbors,
+                timeLimit,
+                iterations,
+                candidates=candidates,
+                stop=self.stop,
+                improved=self.reportImproved(),
+            )
+        return [self.vertices[i] for i in tour], distance
+
+    def lowerBoundRoute(self) -> tuple[list[Vertex], float]:
+        """MST weight as a lower bound on the optimal cycle without drawing it (no route, so [] for now)."""
+        distance = 0.0
+        for edge in self.getMST().edges:
+            distance += edge[0]
+        return [], distance
+
+    def christofidesRoute(
+        self, startVertex: int | None = None, greedy: bool | None = None
+    ) -> tuple[list[Vertex], float]:
+        """
+        Modifying of MST to become 1 cycle to approach optimal solution.
+        Written based off of explanation from here: https://youtu.be/GiDsjIBOVoA?t=726
+        Odd degree vertices are paired with Graph.minWeightMatching (Edmonds' blossom, O(n^3)), then the
+        Eulerian circuit of MST + matching is shortcut into a cycle in O(E).
+        greedy: True for the fast greedy matching, False for blossom, None picks greedy past 1000 odd vertices
+        - blossom only looks at the 10 cheapest edges of each odd vertex past 100 of them to keep it quick
+        - stop is checked between phases and between blossom stages, the MST and Euler tour run to completion
+        """
+        if startVertex is None:
+            startVertex = self.defaultStart()
+
+        with metrics.span("mst"):
+            mst = self.getMST()
+        if self.stop is not None and self.stop():
+            raise SolveCancelled
+        # get odd degree vertices in MST
+        oddVertices = []
+        for vertex in mst:
+            if len(mst[vertex]) % 2:
+                oddVertices.append(vertex)
+        metrics.count("christofides.oddVertices", len(oddVertices))
+        # pair up odd degree vertices w/ min weight to even out degrees
+        if greedy is None:
+            greedy = len(oddVertices) > 1000
+        neighbors = 10 if len(oddVertices) > 100 else None
+        with metrics.span("matching"):
+            matchEdges = self.minWeightMatching(oddVertices, greedy, neighbors, self.stop)
+        if self.stop is not None and self.stop():
+            raise SolveCancelled
+
+        with metrics.span("eulerTour"):
+            # add min cost perfect match to a copy of the MST for Eulerian tour so the cached MST stays a tree
+            multigraph = Graph()
+            for vertex in mst:
+                multigraph.addVertex(vertex)
+            for weight, vertex1, vertex2 in mst.edges + matchEdges:
+                multigraph.addEdge(vertex1, vertex2, weight)
+
+            # walk the Eulerian circuit and shortcut past vertices already visited
+            index = {vert: i for i, vert in enumerate(multigraph)}
+            visited = bytearray(len(index))
+            route = []
+            for vert in multigraph.eulerianCircuit(startVertex):
+                if not visited[index[vert]]:
+                    visited[index[vert]] = 1
+                    route.append(vert)
+            route.append(startVertex)
+        with metrics.span("routeCost"):
+            distance = self.getRouteCost(route)
+        return route, distance
+
+
+class SparseRouteGraph(CandidateGraph, RouteGraph):
+    """
+    RouteGraph on the k nearest candidate graph for big point sets where the complete graph doesn't fit.
+    The route methods run unchanged: the MST comes from Kruskal on the candidate edges, matching and route costs
+    use exact distances on demand, and local search uses the candidate lists with distances computed as needed.
+    """
+
+    def __init__(
+        self,
+        vertices: Sequence[Vertex],
+        locations: Sequence[Sequence[float]],
+        k: int = 10,
+        start: Vertex | None = None,
+    ):
+        CandidateGraph.__init__(self, vertices, locations, k)
+        self.start = start
+        self.mst: Graph | None = None
+        # set by whoever runs a solve on another thread, the long searches check it and raise SolveCancelled
+        self.stop: Callable[[], bool] | None = None
+        # anytime hook, improved(route, distance, elapsed seconds) is called with better routes as they are found
+        self.improved: Callable[[list[Vertex], float, float], None] | None = None
+
+    def tourDistances(
+        self, neighbors: int
+    ) -> tuple[EuclideanDistances, list[list[int]]]:
+        return EuclideanDistances(self.locations.tolist()), self.nearest[:, :neighbors].tolist()
+
+
+def routeGraph(
+    points: Sequence[Sequence[float]], start: int = 0, k: int = 10
+) -> RouteGraph:
+    """Route graph over points by index, the sparse k nearest graph past SPARSE_GRAPH_PINS points."""
+    vertices = list(range(len(points)))
+    if len(points) > SPARSE_GRAPH_PINS:
+        return SparseRouteGraph(vertices, points, k, start)
+    return RouteGraph(vertices, points, start)
+
+
+# route methods by name for batch runs, each called as method(graph, timeLimit)
+METHODS: dict[str, Callable[[RouteGraph, float | None], tuple[list[Vertex], float]]] = {
+    "nearest": lambda graph, timeLimit: graph.nearestNeighborRoute(),
+    "brute": lambda graph, timeLimit: graph.bruteForceRoute(),
+    "heldkarp": lambda graph, timeLimit: graph.heldKarpRoute(),
+    "branchbound": lambda graph, timeLimit: graph.branchAndBoundRoute(),
+    "christofides": lambda graph, timeLimit: graph.christofidesRoute(),
+    "mst": lambda graph, timeLimit: graph.lowerBoundRoute(),
+    "2opt": lambda graph, timeLimit: graph.improveRoute(
+        graph.nearestNeighborRoute(), timeLimit
+    ),
+    "christofides2opt": lambda graph, timeLimit: graph.improveRoute(
+        graph.christofidesRoute(), timeLimit
+    ),
+    "lk": lambda graph, timeLimit: graph.linKernighanRoute(timeLimit=timeLimit),
+}
+
+
+# methods that stop on timeLimit, the rest ignore it
+TIMED_METHODS = ("2opt", "christofides2opt", "lk")
+
+
+# methods that can start from a known route close to the answer, called as method(graph, route, timeLimit)
+WARM_METHODS: dict[
+    str, Callable[[RouteGraph, list[Vertex], float | None], tuple[list[Vertex], float]]
+] = {
+    "2opt": lambda graph, route, timeLimit: graph.improveRoute(
+        (route, graph.getRouteCost(route)), timeLimit
+    ),
+    "christofides2opt": lambda graph, route, timeLimit: graph.improveRoute(
+        (route, graph.getRouteCost(route)), timeLimit
+    ),
+    "lk": lambda graph, route, timeLimit: graph.linKernighanRoute(
+        route[0], timeLimit=timeLimit, route=route
+    ),
+    "branchbound": lambda graph, route, timeLimit: graph.branchAndBoundRoute(
+        route[0], seed=route
+    ),
+}
+
+
+def solveRoute(
+    points: Sequence[Sequence[float]],
+    method: str = "lk",
+    start: int = 0,
+    timeLimit: float | None = 5.0,
+    cache=None,
+) -> tuple[list[int], float]:
+    """
+    Route through (x, y) points with one of METHODS, returned as (point indices starting and ending at start, distance).
+    timeLimit caps the local searches (2opt, christofides2opt, lk) in seconds, None runs them to the end.
+    "mst" gives no route, only the lower bound as the distance.
+    cache: a RouteCache.RouteCache to look the route up in (and store it to) first
+    Raises ValueError for an unknown method, no points or a start that isn't a point index.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown method {method!r}, expected one of {', '.join(METHODS)}")
+    if not len(points):
+        raise ValueError("Cannot create cycle from 0 pins placed.")
+    if not 0 <= start < len(points):
+        raise ValueError(f"Start pin {start} is not one of the {len(points)} pins")
+    if cache is not None:
+        # a cache hit doesn't need the graph at all
+        cached = cache.find(points, start, method, timeLimit)
+        if cached is not None:
+            return cached
+    with metrics.span("buildGraph"):
+        graph = routeGraph(points, start)
+    with metrics.span(method):
+        if cache is not None:
+            return cache.route(graph, method, timeLimit)
+        return METHODS[method](graph, timeLimit)
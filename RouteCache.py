@@ -0,0 +1,311 @@
+"""
+Disk backed cache of solved routes so re-submitting the same pins is instant.
+
+Entries are keyed by a fingerprint of the pin coordinates (sorted, so the order pins were placed in and their
+canvas ids don't matter), the start pin's position among them, the route method and, for the local searches, how
+much time they were given. When there's no exact match but a
+cached pin set differs by only a few pins, its route is patched (removed pins dropped, new ones inserted where
+they add the least) and handed to the methods in Route.WARM_METHODS to start from.
+"""
+
+import math
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+from hashlib import sha256
+from time import time
+from typing import Iterator
+
+import numpy as np
+
+from Metrics import metrics
+from Route import METHODS, TIMED_METHODS, WARM_METHODS, RouteGraph, Vertex
+
+DEFAULT_PATH = os.environ.get(
+    "ROADTRIP_CACHE", os.path.join(os.path.expanduser("~"), ".roadtrip", "routes.sqlite")
+)
+# coordinates are rounded to this many decimals before hashing so float noise doesn't miss the cache
+PRECISION = 6
+
+
+def canonicalPins(locations) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Pins in a fixed order whatever order they came in: (sorted coordinates, order) where
+    sorted coordinates[i] = locations[order[i]].
+    """
+    coords = np.round(np.asarray(locations, dtype=np.float64).reshape(-1, 2), PRECISION)
+    # adding 0 turns -0.0 into 0.0 so both hash the same
+    coords += 0.0
+    order = np.lexsort((coords[:, 1], coords[:, 0]))
+    return coords[order], order
+
+
+def budgetClass(method: str, timeLimit: float | None) -> str:
+    """
+    Time limits that should give about the same route: "" for methods that don't take one, otherwise the limit
+    rounded to a power of two ("unlimited" for None) so a 0.1 s result isn't handed out for a 30 s request.
+    """
+    if method not in TIMED_METHODS:
+        return ""
+    if timeLimit is None:
+        return "unlimited"
+    if timeLimit <= 0:
+        return "0"
+    return f"{2.0 ** round(math.log2(timeLimit)):g}"
+
+
+def pinSetKey(coords: np.ndarray, startPosition: int, method: str, budget: str = "") -> str:
+    """
+    Fingerprint of canonical coordinates, the start pin's position in them, the method and its budgetClass.
+    The position rather than the start's coordinates, so pins stacked on the same spot don't share entries.
+    """
+    digest = sha256(f"{method}:{budget}:{startPosition}:".encode())
+    digest.update(coords.tobytes())
+    return digest.hexdigest()
+
+
+def patchTour(
+    cachedCoords: np.ndarray, cachedTour: list[int], coords: np.ndarray
+) -> list[int] | None:
+    """
+    Turn a tour over cachedCoords (canonical positions) into a cycle over coords: pins no longer there are skipped
+    and new pins are added by cheapest insertion, O(n) each. Returns positions in coords without the closing
+    repeat, None if nothing is shared.
+    """
+    position = {tuple(loc): i for i, loc in enumerate(coords.tolist())}
+    tour = []
+    seen = set()
+    for i in cachedTour:
+        j = position.get(tuple(cachedCoords[i].tolist()))
+        if j is not None and j not in seen:
+            seen.add(j)
+            tour.append(j)
+    if not tour:
+        return None
+    for j in range(len(coords)):
+        if j in seen:
+            continue
+        if len(tour) < 2:
+            tour.append(j)
+            continue
+        here = coords[tour]
+        after = np.roll(here, -1, axis=0)
+        point = coords[j]
+        added = (
+            np.hypot(*(here - point).T)
+            + np.hypot(*(after - point).T)
+            - np.hypot(*(here - after).T)
+        )
+        tour.insert(int(added.argmin()) + 1, j)
+    return tour
+
+
+class RouteCache:
+    """
+    SQLite store of (route, distance) by pin set fingerprint, keeping the maxEntries most recently used.
+    A connection is opened per call so the cache can be shared by the GUI's solver thread and other threads.
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH, maxEntries: int = 1000, maxChanged: float = 0.1):
+        """maxChanged: warm start from pin sets differing by at most this fraction of pins (at least 3)"""
+        self.path = path
+        self.maxEntries = maxEntries
+        self.maxChanged = maxChanged
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # :memory: databases only live as long as their connection, keep one for them (shared under a lock)
+        self.memory = sqlite3.connect(path, check_same_thread=False) if path == ":memory:" else None
+        self.lock = threading.Lock()
+        with self.transaction() as db:
+            db.execute(
+                """CREATE TABLE IF NOT EXISTS routes (
+                    key TEXT PRIMARY KEY,
+                    method TEXT NOT NULL,
+                    pins INTEGER NOT NULL,
+                    coords BLOB NOT NULL,
+                    route BLOB NOT NULL,
+                    distance REAL NOT NULL,
+                    lastUsed REAL NOT NULL
+                )"""
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS routesBySize ON routes (method, pins)")
+            db.execute("CREATE INDEX IF NOT EXISTS routesByUse ON routes (lastUsed)")
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Connection committed when the block ends (rolled back if it raises) and then closed."""
+        if self.memory is not None:
+            with self.lock, self.memory:
+                yield self.memory
+            return
+        db = sqlite3.connect(self.path, timeout=5.0)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def __len__(self) -> int:
+        with self.transaction() as db:
+            return db.execute("SELECT COUNT(*) FROM routes").fetchone()[0]
+
+    def clear(self) -> None:
+        with self.transaction() as db:
+            db.execute("DELETE FROM routes")
+
+    def get(
+        self, locations, start: int, method: str, timeLimit: float | None = None
+    ) -> tuple[list[int], float] | None:
+        """
+        Cached (route as indices into locations starting at start, distance) for these pins, start index, method and
+        time limit (see budgetClass), None if missing.
+        """
+        coords, order = canonicalPins(locations)
+        startPosition = int(np.flatnonzero(order == start)[0])
+        key = pinSetKey(coords, startPosition, method, budgetClass(method, timeLimit))
+        with self.transaction() as db:
+            row = db.execute(
+                "SELECT coords, route, distance FROM routes WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE routes SET lastUsed = ? WHERE key = ?", (time(), key))
+        if not np.array_equal(np.frombuffer(row[0]), coords.ravel()):
+            return None
+        route = order[np.frombuffer(row[1], dtype=np.int32)].tolist()
+        if route and route[0] != start and start in route:
+            # closed route, turn it to begin (and end) at start
+            startAt = route.index(start)
+            route = route[startAt:-1] + route[:startAt] + [start]
+        return route, row[2]
+
+    def find(
+        self, locations, start: int, method: str, timeLimit: float | None = None
+    ) -> tuple[list[int], float] | None:
+        """get() that counts the hit and treats the cache failing as a miss."""
+        try:
+            with metrics.span("cacheLookup"):
+                cached = self.get(locations, start, method, timeLimit)
+        except sqlite3.Error as error:
+            print(f"Route cache unavailable: {error}", file=sys.stderr)
+            return None
+        if cached is not None:
+            metrics.count("routeCache.hits")
+        return cached
+
+    def put(
+        self,
+        locations,
+        start: int,
+        method: str,
+        route: list[int],
+        distance: float,
+        timeLimit: float | None = None,
+    ) -> None:
+        """Store a route given as indices into locations, dropping the least recently used past maxEntries."""
+        coords, order = canonicalPins(locations)
+        startPosition = int(np.flatnonzero(order == start)[0])
+        key = pinSetKey(coords, startPosition, method, budgetClass(method, timeLimit))
+        # route indices -> canonical positions
+        rank = np.empty(len(order), dtype=np.int32)
+        rank[order] = np.arange(len(order), dtype=np.int32)
+        canonicalRoute = rank[np.asarray(route, dtype=np.int64)] if route else np.empty(0, np.int32)
+        with self.transaction() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO routes VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    method,
+                    len(coords),
+                    coords.tobytes(),
+                    canonicalRoute.astype(np.int32).tobytes(),
+                    float(distance),
+                    time(),
+                ),
+            )
+            db.execute(
+                """DELETE FROM routes WHERE key IN (
+                    SELECT key FROM routes ORDER BY lastUsed DESC LIMIT -1 OFFSET ?
+                )""",
+                (self.maxEntries,),
+            )
+
+    def warmStart(self, locations, start: int, method: str, candidates: int = 16) -> list[int] | None:
+        """
+        Closed tour (indices into locations, from start back to start) patched from the recently used cached route
+        of the same method whose pin set differs least, if it differs by no more than maxChanged.
+        """
+        coords, order = canonicalPins(locations)
+        n = len(coords)
+        limit = max(3, int(n * self.maxChanged))
+        with self.transaction() as db:
+            rows = db.execute(
+                """SELECT coords, route FROM routes WHERE method = ? AND pins BETWEEN ? AND ?
+                ORDER BY lastUsed DESC LIMIT ?""",
+                (method, n - limit, n + limit, candidates),
+            ).fetchall()
+        current = set(map(tuple, coords.tolist()))
+        best = None
+        for cachedCoords, cachedRoute in rows:
+            cachedCoords = np.frombuffer(cachedCoords).reshape(-1, 2)
+            shared = len(current.intersection(map(tuple, cachedCoords.tolist())))
+            changed = (n - shared) + (len(cachedCoords) - shared)
+            if changed <= limit and (best is None or changed < best[0]):
+                best = (changed, cachedCoords, np.frombuffer(cachedRoute, dtype=np.int32))
+        if best is None or not len(best[2]):
+            return None
+        tour = patchTour(best[1], best[2][:-1].tolist(), coords)
+        if tour is None:
+            return None
+        tour = order[tour].tolist()
+        startAt = tour.index(start)
+        return tour[startAt:] + tour[:startAt] + [start]
+
+    def route(
+        self,
+        graph: RouteGraph,
+        method: str,
+        timeLimit: float | None = 5.0,
+        startVertex: Vertex | None = None,
+    ) -> tuple[list[Vertex], float]:
+        """
+        graph's route by method, from the cache when these pins were solved before, otherwise solved (warm started
+        from a close cached pin set when the method supports it) and stored. The cache failing (locked, read only
+        disk...) never stops the solve.
+        """
+        if startVertex is None:
+            startVertex = graph.defaultStart()
+        locations = graph.locations
+        start = graph.index[startVertex]
+        try:
+            with metrics.span("cacheLookup"):
+                cached = self.get(locations, start, method, timeLimit)
+                warm = None
+                if cached is None and method in WARM_METHODS:
+                    warm = self.warmStart(locations, start, method)
+        except sqlite3.Error as error:
+            print(f"Route cache unavailable: {error}", file=sys.stderr)
+            return METHODS[method](graph, timeLimit)
+
+        if cached is not None:
+            metrics.count("routeCache.hits")
+            route, distance = cached
+            return [graph.vertices[i] for i in route], distance
+        if warm is not None:
+            metrics.count("routeCache.warmStarts")
+            route, distance = WARM_METHODS[method](
+                graph, [graph.vertices[i] for i in warm], timeLimit
+            )
+        else:
+            metrics.count("routeCache.misses")
+            route, distance = METHODS[method](graph, timeLimit)
+
+        try:
+            self.put(
+                locations, start, method, [graph.index[vert] for vert in route], distance, timeLimit
+            )
+        except sqlite3.Error as error:
+            print(f"Route cache unavailable: {error}", file=sys.stderr)
+        return route, distance
@@ -0,0 +1,355 @@
+"""Spatial index over (x, y) points for nearest point and overlap queries without a distance matrix"""
+
+from heapq import heappush, heapreplace
+from math import hypot, sqrt
+from typing import Hashable, Iterable, Sequence
+
+import numpy as np
+
+
+class PointGrid:
+    """
+    Buckets points into square cells so nearby points can be found by looking at a few cells.
+    Points are stored under any hashable key (pins, vertex ids) and can be inserted, moved and removed.
+    Time complexity:
+    - insert / remove / move: O(1)
+    - nearest: O(points in the cells near the query), grows with the empty area around it after many removals
+    """
+
+    def __init__(
+        self,
+        cellSize: float,
+        points: Iterable[tuple[Hashable, Sequence[float]]] = (),
+    ):
+        if cellSize <= 0:
+            raise ValueError("Cell size must be positive")
+        self.cellSize = cellSize
+        self.points: dict[Hashable, tuple[float, float]] = {}
+        self.cells: dict[tuple[int, int], list[Hashable]] = {}
+        # bounds of every cell ever used so ring searches know when to stop
+        self.minCell = [0, 0]
+        self.maxCell = [-1, -1]
+        for key, loc in points:
+            self.insert(key, loc)
+
+    @classmethod
+    def fromPoints(
+        cls, points: Sequence[Sequence[float]], perCell: float = 2.0
+    ) -> "PointGrid":
+        """Grid keyed by index into points, sized so each cell holds about perCell points."""
+        if not points:
+            return cls(1.0)
+        xs = [loc[0] for loc in points]
+        ys = [loc[1] for loc in points]
+        area = max(max(xs) - min(xs), 1.0) * max(max(ys) - min(ys), 1.0)
+        return cls(sqrt(area * perCell / len(points)), enumerate(points))
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.points
+
+    def cell(self, x: float, y: float) -> tuple[int, int]:
+        return int(x // self.cellSize), int(y // self.cellSize)
+
+    def insert(self, key: Hashable, loc: Sequence[float]) -> None:
+        if key in self.points:
+            self.remove(key)
+        x, y = float(loc[0]), float(loc[1])
+        self.points[key] = (x, y)
+        cx, cy = self.cell(x, y)
+        self.cells.setdefault((cx, cy), []).append(key)
+        if self.maxCell[0] < self.minCell[0]:
+            self.minCell = [cx, cy]
+            self.maxCell = [cx, cy]
+        else:
+            self.minCell = [min(self.minCell[0], cx), min(self.minCell[1], cy)]
+            self.maxCell = [max(self.maxCell[0], cx), max(self.maxCell[1], cy)]
+
+    def remove(self, key: Hashable) -> None:
+        x, y = self.points.pop(key)
+        cell = self.cell(x, y)
+        bucket = self.cells[cell]
+        bucket.remove(key)
+        if not bucket:
+            del self.cells[cell]
+
+    def move(self, key: Hashable, loc: Sequence[float]) -> None:
+        self.insert(key, loc)
+
+    def ringCells(self, cx: int, cy: int, ring: int) -> list[tuple[int, int]]:
+        """Cells exactly ring steps (Chebyshev distance) from cell (cx, cy), clipped to the used bounds."""
+        if ring == 0:
+            return [(cx, cy)]
+        (minX, minY), (maxX, maxY) = self.minCell, self.maxCell
+        lowX, highX = max(cx - ring, minX), min(cx + ring, maxX)
+        lowY, highY = max(cy - ring + 1, minY), min(cy + ring - 1, maxY)
+        cells = []
+        for row in (cy - ring, cy + ring):
+            if minY <= row <= maxY:
+                cells += [(col, row) for col in range(lowX, highX + 1)]
+        for col in (cx - ring, cx + ring):
+            if minX <= col <= maxX:
+                cells += [(col, row) for row in range(lowY, highY + 1)]
+        return cells
+
+    def nearestK(
+        self, x: float, y: float, k: int, exclude: Hashable | None = None
+    ) -> list[tuple[float, Hashable]]:
+        """
+        The k closest stored points to (x, y) as (distance, key), closest first.
+        Searches rings of cells outward and stops once the next ring can't hold anything closer than the kth best.
+        """
+        size = self.cellSize
+        cx, cy = self.cell(x, y)
+        # distance from the query to the edge of its own cell
+        gap = min(x - cx * size, (cx + 1) * size - x, y - cy * size, (cy + 1) * size - y)
+        maxRing = max(
+            cx - self.minCell[0],
+            self.maxCell[0] - cx,
+            cy - self.minCell[1],
+            self.maxCell[1] - cy,
+        )
+        cells = self.cells
+        points = self.points
+        # max heap of the best k by negated distance
+        best: list[tuple[float, Hashable]] = []
+        for ring in range(maxRing + 1):
+            if ring and len(best) == k and -best[0][0] <= (ring - 1) * size + gap:
+                break
+            for cell in self.ringCells(cx, cy, ring):
+                bucket = cells.get(cell)
+                if not bucket:
+                    continue
+                for key in bucket:
+                    if key == exclude:
+                        continue
+                    px, py = points[key]
+                    d = hypot(px - x, py - y)
+                    if len(best) < k:
+                        heappush(best, (-d, key))
+                    elif d < -best[0][0]:
+                        heapreplace(best, (-d, key))
+        return sorted((-negD, key) for negD, key in best)
+
+    def nearest(
+        self, x: float, y: float, exclude: Hashable | None = None
+    ) -> tuple[Hashable, float] | None:
+        """Closest stored point to (x, y) as (key, distance), None if the grid is empty."""
+        found = self.nearestK(x, y, 1, exclude)
+        if not found:
+            return None
+        d, key = found[0]
+        return key, d
+
+    def within(self, x: float, y: float, radius: float) -> list[Hashable]:
+        """Keys of every stored point within radius of (x, y)."""
+        low = self.cell(x - radius, y - radius)
+        high = self.cell(x + radius, y + radius)
+        found = []
+        for col in range(low[0], high[0] + 1):
+            for row in range(low[1], high[1] + 1):
+                for key in self.cells.get((col, row), ()):
+                    px, py = self.points[key]
+                    if hypot(px - x, py - y) <= radius:
+                        found.append(key)
+        return found
+
+
+def nearestNeighborTour(
+    points: Sequence[Sequence[float]], start: int = 0
+) -> tuple[list[int], float]:
+    """
+    Nearest neighbor tour over (x, y) points by index, using a PointGrid and removing each point once visited.
+    Time complexity: ~O(n log n) on evenly spread points, no n x n distance matrix is built
+    Returns the tour starting and ending at start and its euclidean length.
+    """
+    n = len(points)
+    if n == 0:
+        return [], 0.0
+    grid = PointGrid.fromPoints(points)
+    grid.remove(start)
+    tour = [start]
+    distance = 0.0
+    x, y = points[start]
+    for _ in range(n - 1):
+        current, d = grid.nearest(x, y)
+        grid.remove(current)
+        tour.append(current)
+        distance += d
+        x, y = points[current]
+    tour.append(start)
+    distance += hypot(points[start][0] - x, points[start][1] - y)
+    return tour, distance
+
+
+def ringOffsets(low: int, high: int) -> tuple[np.ndarray, np.ndarray]:
+    """(dx, dy) of the cells low to high steps (Chebyshev distance) from a cell."""
+    steps = np.arange(-high, high + 1)
+    dx, dy = np.meshgrid(steps, steps)
+    keep = np.maximum(np.abs(dx), np.abs(dy)) >= low
+    return dx[keep], dy[keep]
+
+
+def kNearest(
+    points: Sequence[Sequence[float]] | np.ndarray,
+    k: int,
+    perCell: float = 2.0,
+    chunkPairs: int = 1 << 21,
+) -> np.ndarray:
+    """
+    Candidate lists from (x, y) points as an n x k array: row i is the k closest other points of point i by index,
+    closest first. Same result as Tour.nearestNeighbors on the distance matrix without ever building it.
+    Vectorised over grids of cells (see searchGrid). Cells are sized for about perCell points where the point is, so
+    crowded clusters get smaller cells instead of a few cells holding thousands of points.
+    Time complexity: ~O(n k log n), no Python object per point
+    chunkPairs: most (point, candidate) pairs held at once
+    """
+    locations = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    n = len(locations)
+    k = min(k, n - 1)
+    if k <= 0:
+        return np.empty((n, 0), dtype=np.int64)
+
+    # cells the size PointGrid.fromPoints would use, then a quarter of the area for every 4x too crowded
+    low = locations.min(axis=0)
+    extent = np.maximum(locations.max(axis=0) - low, 1.0)
+    size = sqrt(float(extent[0] * extent[1]) * perCell / n)
+    cells = ((locations - low) // size).astype(np.int64)
+    _, cellOf, crowding = np.unique(
+        cells[:, 1] * (int(cells[:, 0].max()) + 1) + cells[:, 0], return_inverse=True, return_counts=True
+    )
+    levels = np.floor(np.log(np.maximum(crowding[cellOf] / perCell, 1.0)) / np.log(4)).astype(np.int64)
+
+    # every distance is below span, searchGrid pads with it
+    span = float(np.hypot(*extent)) + 1.0
+    bestDistance = np.full((n, k), span)
+    bestIndex = np.full((n, k), -1, dtype=np.int64)
+    for level in np.unique(levels).tolist():
+        queries = np.flatnonzero(levels == level)
+        searchGrid(locations, low, size / 2**level, queries, span, bestDistance, bestIndex, chunkPairs)
+    return bestIndex
+
+
+def searchGrid(
+    locations: np.ndarray,
+    low: np.ndarray,
+    size: float,
+    queries: np.ndarray,
+    span: float,
+    bestDistance: np.ndarray,
+    bestIndex: np.ndarray,
+    chunkPairs: int,
+) -> None:
+    """
+    Fill in bestDistance / bestIndex rows of the query points with their k closest other points (k = columns).
+    Points are sorted by cell of the given size so every used cell is a slice, and each query looks at rings of cells
+    around its own until the next ring can't hold anything closer than its kth best. All queries of a ring are
+    handled together with numpy, in chunks of about chunkPairs (query, candidate) pairs.
+    """
+    n, k = bestIndex.shape
+    xs = np.ascontiguousarray(locations[:, 0])
+    ys = np.ascontiguousarray(locations[:, 1])
+    cells = ((locations - low) // size).astype(np.int64)
+    width, height = (cells.max(axis=0) + 1).tolist()
+    cellIds = cells[:, 1] * width + cells[:, 0]
+    order = np.argsort(cellIds, kind="stable")
+    # a table of every cell's first slot in order when the grid is small, otherwise only the used cells looked up by
+    # binary search, so small cells over a big area cost nothing
+    dense = width * height <= 4 * n
+    if dense:
+        cellStart = np.zeros(width * height + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cellIds, minlength=width * height), out=cellStart[1:])
+    else:
+        usedIds, cellStart = np.unique(cellIds[order], return_index=True)
+        cellEnd = np.append(cellStart[1:], n)
+    # distance from every point to the edge of its own cell
+    inCell = locations - low - cells * size
+    gap = np.minimum(inCell, size - inCell).min(axis=1)
+
+    active = queries
+    # the first pass takes the point's own cell and the ring around it, then one ring at a time
+    ring = 1
+    dx, dy = ringOffsets(0, ring)
+    while True:
+        # ring cells of every active point (active points x ring cells), empty where off the grid or unused
+        cx = cells[active, 0, None] + dx
+        cy = cells[active, 1, None] + dy
+        onGrid = (cx >= 0) & (cx < width) & (cy >= 0) & (cy < height)
+        ids = np.where(onGrid, cy * width + cx, 0)
+        if dense:
+            firsts = cellStart[ids]
+            counts = np.where(onGrid, cellStart[ids + 1] - firsts, 0)
+        else:
+            slots = np.minimum(np.searchsorted(usedIds, ids), len(usedIds) - 1)
+            firsts = cellStart[slots]
+            counts = np.where(onGrid & (usedIds[slots] == ids), cellEnd[slots] - firsts, 0)
+        # every point's group is its best so far followed by its new candidates
+        groupSizes = counts.sum(axis=1) + k
+        groupEnds = np.cumsum(groupSizes)
+
+        begin = 0
+        while begin < len(active):
+            before = groupEnds[begin - 1] if begin else 0
+            end = max(begin + 1, int(np.searchsorted(groupEnds, before + chunkPairs, side="right")))
+            chunk = active[begin:end]
+            sizes = groupSizes[begin:end]
+            chunkCounts = counts[begin:end].ravel()
+            # position of every candidate in order: its cell's first slot plus how far into the cell it is
+            offsets = np.arange(int(chunkCounts.sum())) - np.repeat(
+                np.cumsum(chunkCounts) - chunkCounts, chunkCounts
+            )
+            found = order[np.repeat(firsts[begin:end].ravel(), chunkCounts) + offsets]
+
+            groupStarts = np.cumsum(sizes) - sizes
+            bestSlots = (groupStarts[:, None] + np.arange(k)).ravel()
+            newSlots = np.ones(int(sizes.sum()), dtype=bool)
+            newSlots[bestSlots] = False
+            owner = np.repeat(chunk, sizes)
+            candidate = np.empty(len(owner), dtype=np.int64)
+            candidate[bestSlots] = bestIndex[chunk].ravel()
+            candidate[newSlots] = found
+            distance = np.empty(len(owner))
+            distance[bestSlots] = bestDistance[chunk].ravel()
+            newOwner = owner[newSlots]
+            distance[newSlots] = np.hypot(xs[found] - xs[newOwner], ys[found] - ys[newOwner])
+            ownPoint = candidate == owner
+            distance[ownPoint] = span
+            candidate[ownPoint] = -1
+
+            # owner * 2 span + distance sorts by owner then distance in one go, groups keep their places in the
+            # sorted order so each one's first k are its new best
+            sort = np.argsort(owner * (2 * span) + distance, kind="stable")
+            firstK = sort[bestSlots]
+            bestDistance[chunk] = distance[firstK].reshape(-1, k)
+            bestIndex[chunk] = candidate[firstK].reshape(-1, k)
+            begin = end
+
+        # anything outside the rings so far is at least this far away
+        settled = bestDistance[active, k - 1] < ring * size + gap[active]
+        active = active[~settled]
+        if not len(active) or ring >= max(width, height):
+            return
+        ring += 1
+        dx, dy = ringOffsets(ring, ring)
+
+
+class EuclideanDistances:
+    """
+    Stands in for a distance matrix over (x, y) points by computing each distance when asked.
+    Supports the dist.item(i, j) and dist[i, j] lookups the tour solvers use, O(n) memory.
+    """
+
+    def __init__(self, points: Sequence[Sequence[float]]):
+        self.xs = [float(loc[0]) for loc in points]
+        self.ys = [float(loc[1]) for loc in points]
+
+    def __len__(self) -> int:
+        return len(self.xs)
+
+    def item(self, i: int, j: int) -> float:
+        return hypot(self.xs[i] - self.xs[j], self.ys[i] - self.ys[j])
+
+    def __getitem__(self, pair: tuple[int, int]) -> float:
+        return self.item(*pair)
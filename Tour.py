@@ -0,0 +1,845 @@
+"""Tour solvers that work on a dense distance matrix (row/column i = vertex i)
+
+localSearch and linKernighan only need dist.item(i, j), so with their own candidate lists they also run on
+distances computed on demand (Spatial.EuclideanDistances) for pin sets too big for a matrix.
+"""
+
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import permutations
+from multiprocessing import get_context
+from random import Random
+from time import perf_counter
+from typing import Callable
+
+import numpy as np
+
+from Graph import SolveCancelled, primTree
+from Metrics import metrics
+
+
+# anytime solvers report improved tours at most this often (seconds), the final tour is always returned
+REPORT_INTERVAL = 0.1
+
+type Improved = Callable[[list[int], float, float], None]
+
+
+def tourCost(dist: np.ndarray, tour: list[int]) -> float:
+    """Sum of the edge weights along an ordered list of matrix indices."""
+    cost = 0.0
+    for i in range(1, len(tour)):
+        cost += float(dist[tour[i - 1], tour[i]])
+    return cost
+
+
+def heldKarp(
+    dist: np.ndarray, start: int = 0, stop: Callable[[], bool] | None = None
+) -> tuple[list[int], float]:
+    """
+    Exact shortest cycle through every vertex using the Held-Karp bitmask dynamic program.
+    Time complexity: O(2^n * n^2), memory O(2^n * n)
+    - dp[mask, j] is the cheapest path leaving start, visiting the vertices in mask and ending at j
+    - masks are filled one popcount layer at a time so every layer is a handful of vectorized numpy ops
+    - parent pointers are int8 so only dp (float64) dominates memory, ~350 MB at 22 vertices
+    stop is checked between vectorized steps, SolveCancelled is raised once it returns True
+    """
+    n = len(dist)
+    if n == 0:
+        raise ValueError("Missing vertices to construct path")
+    if n == 1:
+        return [start, start], 0.0
+
+    # vertices other than start get bit positions 0..m-1
+    others = np.array([v for v in range(n) if v != start])
+    m = len(others)
+    sub = dist[np.ix_(others, others)]
+    full = (1 << m) - 1
+
+    dp = np.full((1 << m, m), np.inf)
+    parent = np.full((1 << m, m), -1, dtype=np.int8)
+    for j in range(m):
+        dp[1 << j, j] = dist[start, others[j]]
+
+    # group masks by how many vertices they contain so each layer only depends on the one before
+    masks = np.arange(1 << m, dtype=np.int64)
+    popcounts = np.bitwise_count(masks)
+    for size in range(2, m + 1):
+        layer = masks[popcounts == size]
+        for j in range(m):
+            if stop is not None and stop():
+                raise SolveCancelled
+            # masks in this layer that end on j, extended from the mask without j
+            endMasks = layer[(layer >> j) & 1 == 1]
+            prevMasks = endMasks ^ (1 << j)
+            candidates = dp[prevMasks] + sub[:, j]
+            best = candidates.argmin(axis=1)
+            dp[endMasks, j] = candidates[np.arange(len(endMasks)), best]
+            parent[endMasks, j] = best
+
+    metrics.count("heldKarp.states", m << (m - 1))
+    # close the cycle back to start
+    closing = dp[full] + dist[others, start]
+    last = int(closing.argmin())
+
+    # back trace from the last vertex through parent pointers
+    path = []
+    mask = full
+    j = last
+    while j != -1:
+        path.append(int(others[j]))
+        prev = int(parent[mask, j])
+        mask ^= 1 << j
+        j = prev
+    path.reverse()
+
+    route = [start] + path + [start]
+    return route, tourCost(dist, route)
+
+
+def mstCost(dist: list[list[float]], vertices: list[int]) -> float:
+    """
+    Total weight of the minimum spanning tree over a subset of vertices (Prim on a dense matrix).
+    Time complexity: O(k^2) for k vertices
+    """
+    if len(vertices) <= 1:
+        return 0.0
+    first = vertices[0]
+    # cheapest known edge from the tree to every vertex not in it yet
+    key = {v: dist[first][v] for v in vertices[1:]}
+    total = 0.0
+    while key:
+        vert = min(key, key=key.__getitem__)
+        total += key.pop(vert)
+        row = dist[vert]
+        for other in key:
+            if row[other] < key[other]:
+                key[other] = row[other]
+    return total
+
+
+def oneTreeBound(
+    dist: np.ndarray,
+    start: int = 0,
+    upperBound: float | None = None,
+    iterations: int = 100,
+) -> tuple[float, np.ndarray]:
+    """
+    Held-Karp lower bound from minimum 1-trees (MST of every vertex but start + start's two cheapest edges).
+    Vertex penalties pi are tuned with subgradient steps so the 1-tree degrees get pushed towards 2.
+    Any pi gives a valid bound: tour cost = penalized tour cost - 2 * sum(pi).
+    Returns the best bound found and the penalties that produced it.
+    """
+    n = len(dist)
+    pi = np.zeros(n)
+    if n < 3:
+        return 0.0, pi
+    others = np.array([v for v in range(n) if v != start])
+    bestBound, bestPi = -np.inf, pi.copy()
+    scale = 2.0
+    sinceImproved = 0
+
+    for _ in range(iterations):
+        penalized = dist + pi[:, None] + pi[None, :]
+        treeCost, parent = primTree(penalized[np.ix_(others, others)])
+        startRow = penalized[start, others]
+        cheapest = np.argpartition(startRow, 1)[:2]
+        bound = treeCost + float(startRow[cheapest].sum()) - 2 * float(pi.sum())
+
+        degree = np.zeros(n)
+        np.add.at(degree, others[1:], 1)
+        np.add.at(degree, others[parent[1:]], 1)
+        np.add.at(degree, others[cheapest], 1)
+        degree[start] = 2
+        gradient = degree - 2
+
+        if bound > bestBound:
+            bestBound, bestPi = bound, pi.copy()
+            sinceImproved = 0
+        else:
+            sinceImproved += 1
+            if sinceImproved >= 10:
+                scale /= 2
+                sinceImproved = 0
+        norm = float(gradient @ gradient)
+        if norm == 0:
+            # every vertex has degree 2 so the 1-tree is a tour
+            break
+        target = upperBound if upperBound is not None else bound * 1.05
+        pi = pi + scale * max(target - bound, 1e-9) / norm * gradient
+
+    return float(bestBound), bestPi
+
+
+def branchAndBound(
+    dist: np.ndarray,
+    start: int = 0,
+    incumbent: tuple[list[int], float] | None = None,
+    stop: Callable[[], bool] | None = None,
+    improved: Improved | None = None,
+) -> tuple[list[int], float]:
+    """
+    Exact shortest cycle with a depth first branch and bound search.
+    A partial route is pruned when its cost plus a lower bound on finishing it is no better than the incumbent.
+    - bound = cheapest edge out of the last vertex + MST of the unvisited vertices + cheapest edge back to start
+    - the bound is taken on 1-tree penalized weights (see oneTreeBound) which makes it much tighter
+    - MST costs are cached by the bitmask of unvisited vertices since many partial routes share them
+    - children are tried nearest first so good tours (and tighter pruning) are found early
+    - incumbent is a known (route, distance) to start pruning from, e.g. nearest neighbor or Christofides
+    stop is checked every 1024 search nodes, SolveCancelled is raised once it returns True
+    improved(tour, cost, elapsed seconds) is called with the incumbent and every better tour found (anytime)
+    """
+    startTime = perf_counter()
+    n = len(dist)
+    if n == 0:
+        raise ValueError("Missing vertices to construct path")
+    if n == 1:
+        return [start, start], 0.0
+
+    if incumbent:
+        # recompute the cost rather than trusting it, an optimistic incumbent would prune the optimum
+        bestRoute = list(incumbent[0])
+        bestCost = tourCost(dist, bestRoute)
+    else:
+        bestRoute, bestCost = [], float("inf")
+    if improved is not None and bestRoute:
+        improved(list(bestRoute), bestCost, perf_counter() - startTime)
+    with metrics.span("oneTreeBound"):
+        _, pi = oneTreeBound(dist, start, bestCost if bestRoute else None)
+
+    # plain lists index much faster than numpy scalars in the inner loop
+    d = dist.tolist()
+    penalized = (dist + pi[:, None] + pi[None, :]).tolist()
+    piList = pi.tolist()
+
+    def checkpoint(bound: float) -> float:
+        if stop():
+            raise SolveCancelled
+        return bound
+
+    def found(route: list[int], cost: float) -> None:
+        improved(list(route), cost, perf_counter() - startTime)
+
+    with metrics.span("search"):
+        bestRoute, bestCost = depthFirst(
+            d,
+            penalized,
+            piList,
+            [start],
+            0.0,
+            (bestRoute, bestCost),
+            {},
+            checkpoint if stop is not None else None,
+            found if improved is not None else None,
+        )
+    return bestRoute, tourCost(dist, bestRoute)
+
+
+def depthFirst(
+    d: list[list[float]],
+    penalized: list[list[float]],
+    piList: list[float],
+    path: list[int],
+    cost: float,
+    best: tuple[list[int], float],
+    mstCache: dict[int, float],
+    checkpoint: Callable[[float], float] | None = None,
+    found: Callable[[list[int], float], None] | None = None,
+) -> tuple[list[int], float]:
+    """
+    The search behind branchAndBound, from a partial route path (starting at the tour's start) of the given cost.
+    best is the (route, cost) to beat and the best found is returned, ([], cost) if nothing beat it.
+    - checkpoint(best cost) runs every 1024 nodes and returns the cost to prune against (it may raise SolveCancelled)
+    - found(route, cost) is called with every better complete route
+    """
+    n = len(d)
+    start = path[0]
+    bestRoute, bestCost = best
+    nodes = pruned = 0
+
+    def search(path: list[int], cost: float, unvisited: int) -> None:
+        nonlocal bestRoute, bestCost, nodes, pruned
+        nodes += 1
+        if checkpoint is not None and nodes % 1024 == 0:
+            bestCost = checkpoint(bestCost)
+        last = path[-1]
+        if not unvisited:
+            total = cost + d[last][start]
+            if total < bestCost:
+                bestRoute, bestCost = path + [start], total
+                if found is not None:
+                    found(bestRoute, bestCost)
+            return
+
+        remaining = [v for v in range(n) if unvisited >> v & 1]
+        # penalties are removed again: 2 per unvisited vertex, 1 each for the two path ends
+        bound = mstCache.get(unvisited)
+        if bound is None:
+            bound = mstCost(penalized, remaining) - 2 * sum(piList[v] for v in remaining)
+            mstCache[unvisited] = bound
+        bound += cost - piList[last] - piList[start]
+        bound += min(penalized[last][v] for v in remaining)
+        bound += min(penalized[v][start] for v in remaining)
+        if bound >= bestCost - 1e-9:
+            pruned += 1
+            return
+
+        for vert in sorted(remaining, key=d[last].__getitem__):
+            newCost = cost + d[last][vert]
+            # children are sorted by edge cost so none of the rest can do better either
+            if newCost >= bestCost:
+                break
+            path.append(vert)
+            search(path, newCost, unvisited & ~(1 << vert))
+            path.pop()
+
+    unvisited = (1 << n) - 1
+    for vert in path:
+        unvisited &= ~(1 << vert)
+    cached = len(mstCache)
+    search(list(path), cost, unvisited)
+    metrics.count("branchAndBound.nodes", nodes)
+    metrics.count("branchAndBound.boundPrunes", pruned)
+    metrics.count("branchAndBound.mstComputed", len(mstCache) - cached)
+    return bestRoute, bestCost
+
+
+# state of a parallelBranchAndBound worker process, set once per process by initPrefixWorker
+prefixWorkerState: dict = {}
+
+
+def initPrefixWorker(d, penalized, piList, sharedBound, cancelled) -> None:
+    prefixWorkerState.update(
+        d=d,
+        penalized=penalized,
+        piList=piList,
+        sharedBound=sharedBound,
+        cancelled=cancelled,
+        # MST bounds by unvisited bitmask carry over between the prefixes a process gets
+        mstCache={},
+    )
+
+
+def prefixWorker(prefix: tuple[int, ...]) -> tuple[list[int], float] | None:
+    """Search every tour that starts with prefix, returns the best one if it beat the shared bound."""
+    state = prefixWorkerState
+    d = state["d"]
+    sharedBound = state["sharedBound"]
+    cancelled = state["cancelled"]
+    if cancelled.is_set():
+        return None
+
+    def checkpoint(bound: float) -> float:
+        if cancelled.is_set():
+            raise SolveCancelled
+        # another worker may have found a shorter tour, prune against it as well
+        return min(bound, sharedBound.value)
+
+    def found(route: list[int], cost: float) -> None:
+        with sharedBound.get_lock():
+            if cost < sharedBound.value:
+                sharedBound.value = cost
+
+    cost = 0.0
+    for i in range(1, len(prefix)):
+        cost += d[prefix[i - 1]][prefix[i]]
+    try:
+        route, cost = depthFirst(
+            d,
+            state["penalized"],
+            state["piList"],
+            list(prefix),
+            cost,
+            ([], sharedBound.value),
+            state["mstCache"],
+            checkpoint,
+            found,
+        )
+    except SolveCancelled:
+        return None
+    return (route, cost) if route else None
+
+
+def parallelBranchAndBound(
+    dist: np.ndarray,
+    start: int = 0,
+    incumbent: tuple[list[int], float] | None = None,
+    workers: int | None = None,
+    stop: Callable[[], bool] | None = None,
+    improved: Improved | None = None,
+    depth: int = 2,
+) -> tuple[list[int], float]:
+    """
+    branchAndBound split over processes: every route prefix of depth vertices after start is its own sub-problem,
+    handed out nearest first to a ProcessPoolExecutor (workers processes, all cores by default).
+    - the best cost found so far sits in shared memory, workers prune against it as soon as anyone improves it
+    - each process keeps its MST bound cache across the prefixes it gets
+    - stop and improved work like in branchAndBound, improved gets the best route each time a prefix finishes
+    Worth it from ~20 vertices, below that starting the processes costs more than the search.
+    """
+    startTime = perf_counter()
+    n = len(dist)
+    if n <= depth + 3:
+        return branchAndBound(dist, start, incumbent, stop, improved)
+
+    if incumbent:
+        bestRoute = list(incumbent[0])
+        bestCost = tourCost(dist, bestRoute)
+    else:
+        bestRoute, bestCost = [], float("inf")
+    if improved is not None and bestRoute:
+        improved(list(bestRoute), bestCost, perf_counter() - startTime)
+    with metrics.span("oneTreeBound"):
+        _, pi = oneTreeBound(dist, start, bestCost if bestRoute else None)
+
+    d = dist.tolist()
+    penalized = (dist + pi[:, None] + pi[None, :]).tolist()
+    others = [v for v in range(n) if v != start]
+    prefixes = [(start,) + rest for rest in permutations(others, depth)]
+    prefixes.sort(key=lambda prefix: sum(d[a][b] for a, b in zip(prefix, prefix[1:])))
+    metrics.count("branchAndBound.prefixes", len(prefixes))
+
+    # spawn works the same everywhere and doesn't fork the GUI's threads
+    context = get_context("spawn")
+    sharedBound = context.Value("d", bestCost)
+    cancelled = context.Event()
+    with ProcessPoolExecutor(
+        workers,
+        mp_context=context,
+        initializer=initPrefixWorker,
+        initargs=(d, penalized, pi.tolist(), sharedBound, cancelled),
+    ) as pool:
+        pending = {pool.submit(prefixWorker, prefix) for prefix in prefixes}
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                if stop is not None and stop():
+                    raise SolveCancelled
+                for future in done:
+                    result = future.result()
+                    if result and result[1] < bestCost:
+                        bestRoute, bestCost = result
+                        if improved is not None:
+                            improved(list(bestRoute), bestCost, perf_counter() - startTime)
+        finally:
+            # let running workers bail out at their next checkpoint and drop the queued prefixes
+            cancelled.set()
+            for future in pending:
+                future.cancel()
+    return bestRoute, tourCost(dist, bestRoute)
+
+
+def nearestNeighbors(dist: np.ndarray, k: int) -> list[list[int]]:
+    """
+    Candidate lists: the k closest other vertices of every vertex, closest first.
+    Rows are handled in blocks so the partial sort never needs more than a block of the matrix at once.
+    """
+    n = len(dist)
+    k = min(k, n - 1)
+    if k <= 0:
+        return [[] for _ in range(n)]
+    candidates = []
+    for begin in range(0, n, 1024):
+        block = dist[begin : begin + 1024].copy()
+        # never pick a vertex as its own neighbor
+        block[np.arange(len(block)), np.arange(begin, begin + len(block))] = np.inf
+        closest = np.argpartition(block, k - 1, axis=1)[:, :k]
+        order = np.take_along_axis(block, closest, axis=1).argsort(axis=1)
+        candidates.extend(np.take_along_axis(closest, order, axis=1).tolist())
+    return candidates
+
+
+def localSearch(
+    dist: np.ndarray,
+    tour: list[int],
+    neighbors: int = 10,
+    timeLimit: float | None = None,
+    candidates: list[list[int]] | None = None,
+    stop: Callable[[], bool] | None = None,
+    improved: Improved | None = None,
+) -> tuple[list[int], float]:
+    """
+    Improve a closed tour ([start, ..., start]) with 2-opt and Or-opt moves until no move helps or time runs out.
+    - only moves that connect a vertex to one of its k nearest neighbors are tried (candidate lists)
+    - don't look bits: a vertex is only looked at again after one of its tour edges changed
+    - 2-opt reverses whichever side of the cycle is shorter, Or-opt moves segments of 1-3 vertices
+    candidates: precomputed nearest neighbor lists, otherwise the k nearest are taken from dist
+    stop: checked alongside the time limit, SolveCancelled is raised once it returns True
+    improved: called as improved(tour, cost, elapsed seconds) with the tour so far every REPORT_INTERVAL while it improves
+    Returns the improved tour, still starting and ending at the same vertex, and its cost.
+    """
+    n = len(tour) - 1
+    if n < 4:
+        return list(tour), tourCost(dist, tour)
+    startTime = perf_counter()
+    deadline = None if timeLimit is None else startTime + timeLimit
+    w = dist.item
+    if candidates is None:
+        candidates = nearestNeighbors(dist, neighbors)
+    order = list(tour[:-1])
+    pos = [0] * n
+    for i, vert in enumerate(order):
+        pos[vert] = i
+
+    def succ(vert: int) -> int:
+        return order[(pos[vert] + 1) % n]
+
+    def pred(vert: int) -> int:
+        return order[pos[vert] - 1]
+
+    def reverse(i: int, j: int, shortest: bool = False) -> None:
+        """Reverse positions i..j going forward (wrapping), or the other side of the cycle if shorter."""
+        length = (j - i) % n + 1
+        if shortest and 2 * length > n:
+            i, j = (j + 1) % n, (i - 1) % n
+            length = n - length
+        for _ in range(length // 2):
+            a, b = order[i], order[j]
+            order[i], order[j] = b, a
+            pos[b], pos[a] = i, j
+            i = (i + 1) % n
+            j = (j - 1) % n
+
+    def twoOpt(a: int) -> list[int] | None:
+        for forward in (True, False):
+            b = succ(a) if forward else pred(a)
+            removed = w(a, b)
+            for c in candidates[a]:
+                added = w(a, c)
+                # the new edge alone is already no shorter than the one it replaces
+                if added >= removed:
+                    break
+                d = succ(c) if forward else pred(c)
+                if c == b or d == a:
+                    continue
+                if added + w(b, d) < removed + w(c, d) - 1e-10:
+                    if forward:
+                        reverse(pos[b], pos[c], shortest=True)
+                    else:
+                        reverse(pos[a], pos[d], shortest=True)
+                    return [a, b, c, d]
+        return None
+
+    def orOpt(a: int) -> list[int] | None:
+        for length in (1, 2, 3):
+            if n < length + 3:
+                break
+            segment = [order[(pos[a] + i) % n] for i in range(length)]
+            first, last = segment[0], segment[-1]
+            p, nx = pred(first), succ(last)
+            gain = w(p, first) + w(last, nx) - w(p, nx)
+            for end in (first, last):
+                for c in candidates[end]:
+                    if w(end, c) >= gain:
+                        break
+                    if c in segment:
+                        continue
+                    for x, y in ((c, succ(c)), (pred(c), c)):
+                        if x in segment or y in segment:
+                            continue
+                        keep = w(x, first) + w(last, y)
+                        flip = w(x, last) + w(first, y)
+                        if min(keep, flip) - w(x, y) < gain - 1e-10:
+                            moveSegment(first, last, length, x, y, flip < keep)
+                            return [p, nx, first, last, x, y]
+        return None
+
+    def moveSegment(first: int, last: int, length: int, x: int, y: int, flipped: bool) -> None:
+        """Move the segment first..last between x and y=succ(x), reversed if flipped (x-last, first-y)."""
+        i = pos[first]
+        # vertices nx..x ahead of the segment and y..p behind it, reverse through whichever arc is shorter
+        forwardArc = (pos[x] - pos[last] - 1) % n + 1
+        backwardArc = n - length - forwardArc
+        if forwardArc <= backwardArc:
+            # p S nx .. x y  ->  p nx .. x S y
+            reverse(i, pos[x])
+            reverse(i, (i + forwardArc - 1) % n)
+            if not flipped:
+                reverse((i + forwardArc) % n, (i + forwardArc + length - 1) % n)
+        else:
+            # x y .. p S nx  ->  x S y .. p nx
+            j = pos[y]
+            reverse(j, pos[last])
+            reverse((j + length) % n, (j + length + backwardArc - 1) % n)
+            if not flipped:
+                reverse(j, (j + length - 1) % n)
+
+    def currentRoute() -> list[int]:
+        start = tour[0]
+        return order[pos[start] :] + order[: pos[start]] + [start]
+
+    queue = deque(order)
+    queued = bytearray([1]) * n
+    steps = moves = 0
+    changed = False
+    lastReport = startTime
+    while queue:
+        steps += 1
+        if steps % 64 == 0:
+            if stop is not None and stop():
+                raise SolveCancelled
+            now = perf_counter()
+            if deadline is not None and now > deadline:
+                break
+            if improved is not None and changed and now - lastReport >= REPORT_INTERVAL:
+                route = currentRoute()
+                improved(route, tourCost(dist, route), now - startTime)
+                lastReport = now
+                changed = False
+        a = queue.popleft()
+        queued[a] = 0
+        touched = twoOpt(a) or orOpt(a)
+        if touched:
+            moves += 1
+            changed = True
+            # changed edges turn the don't look bits of their ends back off
+            for vert in touched:
+                if not queued[vert]:
+                    queued[vert] = 1
+                    queue.append(vert)
+
+    metrics.count("localSearch.steps", steps)
+    metrics.count("localSearch.moves", moves)
+    route = currentRoute()
+    return route, tourCost(dist, route)
+
+
+def linKernighan(
+    dist: np.ndarray,
+    tour: list[int],
+    neighbors: int = 8,
+    timeLimit: float | None = None,
+    iterations: int | None = None,
+    maxDepth: int = 50,
+    seed: int = 0,
+    candidates: list[list[int]] | None = None,
+    stop: Callable[[], bool] | None = None,
+    improved: Improved | None = None,
+    patience: int | None = None,
+) -> tuple[list[int], float]:
+    """
+    Lin-Kernighan style variable depth search, repeated from double bridge kicks (chained LK).
+    - one LK step removes an edge (t1, t2) and keeps adding (t2, t3) / removing (t3, t4) pairs with positive
+      partial gain, every step is a 2-opt flip so the tour stays valid, and the best closing point is kept
+    - t3 comes from the k nearest neighbors of t2, picked by the gain after also removing (t3, t4)
+    - edges added in a step are never removed in it and the chain stops at maxDepth
+    - once no step improves, a random double bridge kick reshuffles a short stretch of the tour and LK runs again
+      from its ends; the kicked tour is kept only if it ends up shorter
+    Stops when timeLimit seconds or iterations kicks are used up (n kicks if neither is given), or after patience
+    kicks in a row (n by default) didn't shorten the tour, so small maps don't sit out the whole time limit.
+    candidates: precomputed nearest neighbor lists, otherwise the k nearest are taken from dist
+    stop: checked alongside the time limit, SolveCancelled is raised once it returns True
+    improved: called as improved(tour, cost, elapsed seconds) with the best tour so far every REPORT_INTERVAL while
+    it improves
+    Returns the tour, still starting and ending at the same vertex, and its cost.
+    """
+    n = len(tour) - 1
+    if n < 8:
+        return localSearch(dist, tour, neighbors, timeLimit, candidates, stop, improved)
+    if timeLimit is None and iterations is None:
+        iterations = n
+    if patience is None:
+        patience = n
+    startTime = perf_counter()
+    deadline = None if timeLimit is None else startTime + timeLimit
+    rng = Random(seed)
+    w = dist.item
+    if candidates is None:
+        candidates = nearestNeighbors(dist, neighbors)
+    order = list(tour[:-1])
+    pos = [0] * n
+    for i, vert in enumerate(order):
+        pos[vert] = i
+
+    def succ(vert: int) -> int:
+        return order[(pos[vert] + 1) % n]
+
+    def pred(vert: int) -> int:
+        return order[pos[vert] - 1]
+
+    def reverse(i: int, j: int) -> tuple[int, int]:
+        """Reverse positions i..j (wrapping) or the other side of the cycle if shorter, returns the range used."""
+        length = (j - i) % n + 1
+        if 2 * length > n:
+            i, j = (j + 1) % n, (i - 1) % n
+            length = n - length
+        usedRange = (i, j)
+        for _ in range(length // 2):
+            a, b = order[i], order[j]
+            order[i], order[j] = b, a
+            pos[b], pos[a] = i, j
+            i = (i + 1) % n
+            j = (j - 1) % n
+        return usedRange
+
+    def undo(usedRange: tuple[int, int]) -> None:
+        i, j = usedRange
+        for _ in range(((j - i) % n + 1) // 2):
+            a, b = order[i], order[j]
+            order[i], order[j] = b, a
+            pos[b], pos[a] = i, j
+            i = (i + 1) % n
+            j = (j - 1) % n
+
+    def edgeKey(a: int, b: int) -> tuple[int, int]:
+        return (a, b) if a < b else (b, a)
+
+    def step(t1: int) -> tuple[list[int], float] | None:
+        """One LK step from t1, returns the vertices touched and the gain if the tour got shorter."""
+        for t2 in (succ(t1), pred(t1)):
+            gain = w(t1, t2)
+            flips = []
+            added = set()
+            removed = {edgeKey(t1, t2)}
+            touched = [t1, t2]
+            bestGain = 1e-10
+            bestFlips = 0
+            for _ in range(maxDepth):
+                forward = succ(t1) == t2
+                bestValue = float("-inf")
+                bestT3 = bestT4 = -1
+                for t3 in candidates[t2]:
+                    partial = gain - w(t2, t3)
+                    # candidates are sorted, the partial gain only gets worse from here
+                    if partial <= 0:
+                        break
+                    if t3 == t1 or t3 == succ(t2) or t3 == pred(t2):
+                        continue
+                    t4 = pred(t3) if forward else succ(t3)
+                    if edgeKey(t3, t4) in added or edgeKey(t2, t3) in removed:
+                        continue
+                    value = partial + w(t3, t4)
+                    if value > bestValue:
+                        bestValue, bestT3, bestT4 = value, t3, t4
+                if bestT3 == -1:
+                    break
+
+                t3, t4 = bestT3, bestT4
+                # t1 t2 .. t4 t3  ->  t1 t4 .. t2 t3
+                if forward:
+                    flips.append(reverse(pos[t2], pos[t4]))
+                else:
+                    flips.append(reverse(pos[t4], pos[t2]))
+                added.add(edgeKey(t2, t3))
+                removed.add(edgeKey(t3, t4))
+                touched += [t3, t4]
+                gain = bestValue
+                closedGain = gain - w(t4, t1)
+                if closedGain > bestGain:
+                    bestGain = closedGain
+                    bestFlips = len(flips)
+                t2 = t4
+
+            # roll back past the best closing point
+            for usedRange in reversed(flips[bestFlips:]):
+                undo(usedRange)
+            if bestFlips:
+                return touched, bestGain
+        return None
+
+    reportedCost = float("inf")
+    lastReport = startTime
+
+    def report(cost: float) -> None:
+        """Pass the current tour to improved if it is better than the last one reported and it's been a while."""
+        nonlocal reportedCost, lastReport
+        now = perf_counter()
+        if improved is None or cost >= reportedCost - 1e-9 or now - lastReport < REPORT_INTERVAL:
+            return
+        startAt = pos[tour[0]]
+        improved(order[startAt:] + order[:startAt] + [tour[0]], cost, now - startTime)
+        reportedCost = cost
+        lastReport = now
+
+    totalSteps = improvingSteps = 0
+
+    def descend(queue: deque, queued: bytearray, cost: float) -> float:
+        """Run LK steps until every vertex's don't look bit is set (or time is up)."""
+        nonlocal totalSteps, improvingSteps
+        steps = 0
+        while queue:
+            steps += 1
+            if steps % 16 == 0:
+                if stop is not None and stop():
+                    raise SolveCancelled
+                if deadline is not None and perf_counter() > deadline:
+                    break
+                # the tour is only worse than the best while a kick is being repaired
+                if cost < bestCost:
+                    report(cost)
+            t1 = queue.popleft()
+            queued[t1] = 0
+            result = step(t1)
+            if result:
+                improvingSteps += 1
+                touched, gain = result
+                cost -= gain
+                for vert in touched:
+                    if not queued[vert]:
+                        queued[vert] = 1
+                        queue.append(vert)
+        totalSteps += steps
+        return cost
+
+    queued = bytearray([1]) * n
+    bestCost = float("inf")
+    with metrics.span("localOptimum"):
+        cost = descend(deque(order), queued, tourCost(dist, tour))
+    bestCost = cost
+    bestOrder = order[:]
+    report(cost)
+
+    kicks = kept = stale = 0
+    with metrics.span("kicks"):
+        while (
+            (iterations is None or kicks < iterations)
+            and stale < patience
+            and (deadline is None or perf_counter() < deadline)
+        ):
+            kicks += 1
+            if stop is not None and stop():
+                raise SolveCancelled
+            # double bridge on two short neighbouring segments: A B C D -> A C B D
+            lengths = [rng.randint(1, max(1, min(50, n // 3))) for _ in range(2)]
+            first = rng.randrange(n - sum(lengths))
+            second = first + lengths[0]
+            third = second + lengths[1]
+            a1, b1 = order[first], order[first + 1]
+            a2, b2 = order[second], order[second + 1]
+            a3, b3 = order[third], order[(third + 1) % n]
+            cost += (
+                w(a1, b2) + w(a3, b1) + w(a2, b3) - w(a1, b1) - w(a2, b2) - w(a3, b3)
+            )
+            order[first + 1 : third + 1] = order[second + 1 : third + 1] + order[first + 1 : second + 1]
+            for i in range(first + 1, third + 1):
+                pos[order[i]] = i
+
+            queue = deque()
+            for vert in (a1, b1, a2, b2, a3, b3):
+                if not queued[vert]:
+                    queued[vert] = 1
+                    queue.append(vert)
+            cost = descend(queue, queued, cost)
+
+            if cost < bestCost - 1e-9:
+                kept += 1
+                stale = 0
+                bestCost = cost
+                bestOrder = order[:]
+                report(cost)
+            else:
+                stale += 1
+                order[:] = bestOrder
+                for i, vert in enumerate(order):
+                    pos[vert] = i
+                cost = bestCost
+                queued = bytearray(n)
+
+    metrics.count("linKernighan.kicks", kicks)
+    metrics.count("linKernighan.kicksKept", kept)
+    metrics.count("linKernighan.steps", totalSteps)
+    metrics.count("linKernighan.improvingSteps", improvingSteps)
+    start = tour[0]
+    order = bestOrder
+    startAt = order.index(start)
+    route = order[startAt:] + order[:startAt] + [start]
+    return route, tourCost(dist, route)
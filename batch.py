@@ -0,0 +1,163 @@
+"""
+Solve many pin files in one process without the GUI.
+
+    python batch.py pins1.txt pins2.txt --method lk --time-limit 2 --output routes.jsonl
+
+Pin files are either binary .pins files (see PinFile) or text with one "x y" (or "x,y") pair per line, blank lines
+and lines starting with # are skipped.
+One JSON object per file and method is written to the output (stdout by default):
+{"file", "method", "pins", "start", "distance", "seconds", "route"} where route is the pin indices in visiting order,
+plus "metrics" (phase timings and counters) with --metrics. --routes DIR also saves every route as a binary
+.route file named after the pin file and method.
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+from time import perf_counter
+from typing import Sequence
+
+import PinFile
+from Metrics import metrics
+from Route import METHODS, solveRoute
+from RouteCache import DEFAULT_PATH, RouteCache
+
+
+def readPins(path: str) -> tuple[Sequence[Sequence[float]], int | None]:
+    """(x, y) pairs from a pin file and its start pin if it has one, see the module docstring for the formats."""
+    if PinFile.isPinFile(path):
+        pins = PinFile.readPins(path)
+        return pins.locations, pins.start
+    points = []
+    with open(path) as file:
+        for lineNumber, line in enumerate(file, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            values = line.replace(",", " ").split()
+            if len(values) != 2:
+                raise ValueError(f"{path}:{lineNumber}: expected 'x y', got {line!r}")
+            points.append((float(values[0]), float(values[1])))
+    return points, None
+
+
+def solveFile(
+    path: str,
+    method: str,
+    start: int | None = None,
+    timeLimit: float | None = 5.0,
+    withMetrics: bool = False,
+    cache: RouteCache | None = None,
+) -> dict:
+    """
+    Route for one pin file as the JSON ready result written by main().
+    withMetrics adds the solve's phase timings and counters (see Metrics) under "metrics".
+    cache: route cache to look up (and store) the route in
+    start defaults to the pin file's start pin, or the first pin
+    Raises ValueError when the method finds no finite route (e.g. brute force on fewer than 3 pins).
+    """
+    points, fileStart = readPins(path)
+    if start is None:
+        start = fileStart or 0
+    startTime = perf_counter()
+    if withMetrics:
+        with metrics.recording():
+            route, distance = solveRoute(points, method, start, timeLimit, cache)
+            report = metrics.report()
+    else:
+        route, distance = solveRoute(points, method, start, timeLimit, cache)
+    if not math.isfinite(distance):
+        raise ValueError(f"{method} found no finite route through these pins")
+    result = {
+        "file": path,
+        "method": method,
+        "pins": len(points),
+        "start": start,
+        "distance": distance,
+        "seconds": perf_counter() - startTime,
+        "route": route,
+    }
+    if withMetrics:
+        result["metrics"] = report
+    return result
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("files", nargs="+", help="pin files to route")
+    parser.add_argument(
+        "-m",
+        "--method",
+        action="append",
+        choices=list(METHODS),
+        help="route method, repeat to run several on every file (default lk)",
+    )
+    parser.add_argument(
+        "-s", "--start", type=int, help="index of the start pin (default the file's or 0)"
+    )
+    parser.add_argument(
+        "-t",
+        "--time-limit",
+        type=float,
+        default=5.0,
+        help="seconds for the local searches (2opt, christofides2opt, lk), 0 for no limit",
+    )
+    parser.add_argument("-o", "--output", help="write results here instead of stdout")
+    parser.add_argument("--routes", metavar="DIR", help="also save each route as a binary .route file here")
+    parser.add_argument(
+        "--no-route", action="store_true", help="only write distances, not the routes"
+    )
+    parser.add_argument(
+        "--metrics",
+        action="store_true",
+        help="add per phase timings and counters to every result",
+    )
+    parser.add_argument(
+        "--cache",
+        nargs="?",
+        const=DEFAULT_PATH,
+        help=f"reuse and store routes in a route cache (default {DEFAULT_PATH})",
+    )
+    args = parser.parse_args(argv)
+
+    methods = args.method or ["lk"]
+    cache = RouteCache(args.cache) if args.cache else None
+    timeLimit = args.time_limit or None
+    output = open(args.output, "w") if args.output else sys.stdout
+    failed = 0
+    try:
+        for path in args.files:
+            for method in methods:
+                try:
+                    result = solveFile(
+                        path, method, args.start, timeLimit, args.metrics, cache
+                    )
+                except (OSError, ValueError, IndexError) as error:
+                    # keep going through the rest of the batch
+                    print(f"{path} ({method}): {error}", file=sys.stderr)
+                    failed += 1
+                    continue
+                if args.routes:
+                    os.makedirs(args.routes, exist_ok=True)
+                    name = os.path.splitext(os.path.basename(path))[0]
+                    PinFile.writeRoute(
+                        os.path.join(args.routes, f"{name}.{method}.route"),
+                        result["route"],
+                        result["distance"],
+                        method,
+                    )
+                if args.no_route:
+                    del result["route"]
+                # plain JSON only, Infinity and NaN aren't valid for other tools' parsers
+                output.write(json.dumps(result, allow_nan=False) + "\n")
+                output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
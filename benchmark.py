@@ -0,0 +1,310 @@
+"""
+Reproducible solver benchmarks on generated pin sets.
+
+    python benchmark.py --output results.json
+    python benchmark.py --sizes 8 16 100 --families uniform --methods nearest lk --output quick.json
+    python benchmark.py --compare old.json new.json
+
+Every family / size / seed gets a seeded pin set, and every route method in Route.METHODS (plus Graph.kruskal,
+Graph.dijkstra and building the graph itself) is run on it within its size limit. Each run records wall time, peak
+traced memory and the gap to the exact cost (Held-Karp or branch and bound where they ran) or else to the MST lower bound.
+Results are written as JSON so runs from different versions can be compared with --compare.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tracemalloc
+from datetime import datetime, timezone
+from math import ceil, sqrt
+from random import Random
+from time import perf_counter
+from typing import Callable
+
+import numpy as np
+
+from Route import METHODS, RouteGraph, routeGraph
+
+type Pins = list[tuple[float, float]]
+
+# side of the square the pins are spread over
+AREA = 1000.0
+DEFAULT_SIZES = [8, 12, 16, 20, 50, 100, 500, 1000, 2000, 5000, 10000]
+# largest pin set each method is run on, the exact ones blow up past these
+MAX_PINS = {
+    "brute": 9,
+    "heldkarp": 16,
+    "branchbound": 20,
+}
+
+
+def uniformPins(n: int, seed: int) -> Pins:
+    """n pins spread evenly at random over the area."""
+    rng = Random(seed)
+    return [(rng.uniform(0, AREA), rng.uniform(0, AREA)) for _ in range(n)]
+
+
+def clusteredPins(n: int, seed: int) -> Pins:
+    """n pins in gaussian clumps around about sqrt(n) / 2 random centers, like towns on a map."""
+    rng = Random(seed)
+    centers = [
+        (rng.uniform(0, AREA), rng.uniform(0, AREA))
+        for _ in range(max(1, round(sqrt(n) / 2)))
+    ]
+    spread = AREA / (4 * sqrt(len(centers)))
+    pins = []
+    for _ in range(n):
+        x, y = rng.choice(centers)
+        pins.append(
+            (
+                min(max(rng.gauss(x, spread), 0.0), AREA),
+                min(max(rng.gauss(y, spread), 0.0), AREA),
+            )
+        )
+    return pins
+
+
+def gridPins(n: int, seed: int) -> Pins:
+    """n points of a square lattice in shuffled order, lots of equal distances to tie break on."""
+    columns = ceil(sqrt(n))
+    step = AREA / columns
+    pins = [(step * (i % columns), step * (i // columns)) for i in range(n)]
+    Random(seed).shuffle(pins)
+    return pins
+
+
+FAMILIES: dict[str, Callable[[int, int], Pins]] = {
+    "uniform": uniformPins,
+    "clustered": clusteredPins,
+    "grid": gridPins,
+}
+# timed alongside the route methods, they give no distance
+GRAPH_METHODS = ["build", "kruskal", "dijkstra"]
+
+
+def runMethod(
+    method: str, pins: Pins, graph: RouteGraph | None, timeLimit: float | None
+) -> float | None:
+    """Run one method on a fresh graph of pins, returns its distance (None for build / kruskal / dijkstra)."""
+    if method == "build":
+        routeGraph(pins)
+        return None
+    if method == "kruskal":
+        graph.kruskal()
+        return None
+    if method == "dijkstra":
+        graph.dijkstra(0)
+        return None
+    _, distance = METHODS[method](graph, timeLimit)
+    return float(distance)
+
+
+def measure(
+    method: str, pins: Pins, timeLimit: float | None, memory: bool
+) -> dict:
+    """
+    Wall time of one run, then peak memory from a second traced run (tracing slows the run down too much to time it).
+    Building the graph is left out of both except for the build method itself.
+    """
+    # each run gets its own graph so cached MSTs don't carry over
+    def freshGraph() -> RouteGraph | None:
+        return None if method == "build" else routeGraph(pins)
+
+    graph = freshGraph()
+    startTime = perf_counter()
+    distance = runMethod(method, pins, graph, timeLimit)
+    seconds = perf_counter() - startTime
+    peak = None
+    if memory:
+        graph = freshGraph()
+        tracemalloc.start()
+        try:
+            runMethod(method, pins, graph, timeLimit)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return {"seconds": seconds, "peakBytes": peak, "distance": distance}
+
+
+def benchmarkInstance(
+    family: str,
+    size: int,
+    seed: int,
+    methods: list[str],
+    timeLimit: float | None,
+    memory: bool,
+) -> list[dict]:
+    """Results for every method that fits the size on one generated pin set, gaps filled in at the end."""
+    pins = FAMILIES[family](size, seed)
+    results = []
+    for method in methods:
+        if size > MAX_PINS.get(method, size):
+            continue
+        result = {"family": family, "size": size, "seed": seed, "method": method}
+        result.update(measure(method, pins, timeLimit, memory))
+        results.append(result)
+        print(
+            f"{family:>9} {size:>6} seed {seed} {method:>16}: {result['seconds']:9.4f} s"
+            + ("" if result["distance"] is None else f"  {result['distance']:.3f} u"),
+            file=sys.stderr,
+        )
+
+    distances = {result["method"]: result["distance"] for result in results}
+    exact = [distances[method] for method in ("heldkarp", "branchbound", "brute") if method in distances]
+    if exact:
+        reference, referenceKind = min(exact), "exact"
+    elif "mst" in distances:
+        reference, referenceKind = distances["mst"], "lowerBound"
+    else:
+        reference, referenceKind = None, None
+    for result in results:
+        result["reference"] = referenceKind
+        if result["distance"] is None or not reference:
+            result["gap"] = None
+        else:
+            # fraction over the exact cost or the lower bound
+            result["gap"] = result["distance"] / reference - 1
+    return results
+
+
+def environment() -> dict:
+    """What the results were measured on, so runs from different versions and machines can be told apart."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+    }
+
+
+def runBenchmarks(
+    families: list[str],
+    sizes: list[int],
+    seeds: list[int],
+    methods: list[str],
+    timeLimit: float | None = 2.0,
+    memory: bool = True,
+) -> dict:
+    results = []
+    for family in families:
+        for size in sizes:
+            for seed in seeds:
+                results += benchmarkInstance(family, size, seed, methods, timeLimit, memory)
+    return {
+        "environment": environment(),
+        "settings": {
+            "families": families,
+            "sizes": sizes,
+            "seeds": seeds,
+            "methods": methods,
+            "timeLimit": timeLimit,
+            "maxPins": MAX_PINS,
+        },
+        "results": results,
+    }
+
+
+def compareResults(
+    old: dict, new: dict, timeTolerance: float = 0.25, gapTolerance: float = 0.001
+) -> list[str]:
+    """
+    Regressions from old to new results of the same instances: more than timeTolerance slower (ignoring runs
+    under 10 ms) or a route more than gapTolerance longer relative to the old one.
+    """
+    def key(result: dict) -> tuple:
+        return result["family"], result["size"], result["seed"], result["method"]
+
+    before = {key(result): result for result in old["results"]}
+    regressions = []
+    for result in new["results"]:
+        previous = before.get(key(result))
+        if previous is None:
+            continue
+        name = "{} {} seed {} {}".format(*key(result))
+        if (
+            result["seconds"] > previous["seconds"] * (1 + timeTolerance)
+            and result["seconds"] - previous["seconds"] > 0.01
+        ):
+            regressions.append(
+                f"{name}: {previous['seconds']:.4f} s -> {result['seconds']:.4f} s"
+            )
+        if (
+            result["distance"] is not None
+            and previous["distance"]
+            and result["distance"] > previous["distance"] * (1 + gapTolerance)
+        ):
+            regressions.append(
+                f"{name}: {previous['distance']:.3f} u -> {result['distance']:.3f} u"
+            )
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--families", nargs="+", choices=list(FAMILIES), default=list(FAMILIES))
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES)
+    parser.add_argument("--seeds", nargs="+", type=int, default=[0])
+    parser.add_argument(
+        "--methods",
+        nargs="+",
+        choices=GRAPH_METHODS + list(METHODS),
+        default=GRAPH_METHODS + list(METHODS),
+    )
+    parser.add_argument(
+        "--time-limit",
+        type=float,
+        default=2.0,
+        help="seconds for the local searches (2opt, christofides2opt, lk), 0 for no limit",
+    )
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced peak memory runs")
+    parser.add_argument("-o", "--output", default="benchmark.json")
+    parser.add_argument(
+        "--compare",
+        nargs=2,
+        metavar=("OLD", "NEW"),
+        help="list regressions between two result files instead of running",
+    )
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0]) as file:
+            old = json.load(file)
+        with open(args.compare[1]) as file:
+            new = json.load(file)
+        regressions = compareResults(old, new)
+        for regression in regressions:
+            print(regression)
+        print(f"{len(regressions)} regressions", file=sys.stderr)
+        return 1 if regressions else 0
+
+    report = runBenchmarks(
+        args.families,
+        args.sizes,
+        args.seeds,
+        args.methods,
+        args.time_limit or None,
+        not args.no_memory,
+    )
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=1)
+    print(f"{len(report['results'])} results written to {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,40 +1,44 @@
-from tkinter import Event
+from tkinter import Event, filedialog
 from PIL import Image, ImageTk
 import customtkinter as ctk
 from pywinstyles import set_opacity
 
-from Graph import Graph
+from Route import (
+    RouteGraph,
+    SparseRouteGraph,
+    SolveCancelled,
+    SPARSE_GRAPH_PINS,
+    METHODS,
+    Vertex,
+)
+from RouteCache import RouteCache
+from Metrics import metrics
+import PinFile
+from Spatial import PointGrid
 import random
-from math import sqrt
-from itertools import permutations
+import sqlite3
+import threading
+import queue
 
-from typing import Sequence
 from time import time
 
 
-type Vertex = int
+# how often the Tk thread checks on a running solver
+SOLVER_POLL_MS = 50
+# least time between redraws of the improving route while a solver runs
+REDRAW_MS = 200
 
 
-class DisplayGraph(Graph):
+class DisplayGraph(RouteGraph):
+    """
+    RouteGraph over the pins placed on a PinCanvas that can draw itself.
+    Routes start at self.start, which submitLocations sets to the canvas' start pin before handing the graph to the
+    solver thread.
+    """
+
     def __init__(self, canvas: "PinCanvas"):
-        super().__init__()
+        super().__init__(list(canvas.locations), list(canvas.locations.values()))
         self.canvas: PinCanvas = canvas
-        self.mst: Graph | None = None
-
-    def getMST(self) -> Graph:
-        if not self.mst:
-            return self.setMST()
-        return self.mst
-
-    def setMST(self, mst: Graph | None = None) -> Graph:
-        if not mst:
-            self.mst = self.kruskal()
-            return self.mst
-        elif type(mst) is Graph:
-            self.mst = mst
-            return mst
-        else:
-            raise TypeError(f"{type(mst)} is not None or Graph")
 
     def drawEdges(
         self,
@@ -42,132 +46,11 @@ class DisplayGraph(Graph):
         clear: bool = True,
         fill: str = "#faf7f2",
     ):
-        xOffset = self.canvas.pinImg.pinSize[0] // 2
-        yOffset = self.canvas.pinImg.pinSize[1] // 2
-        if clear:
-            for line in self.canvas.lines:
-                self.canvas.delete(line)
-
         if not edges:
             edges = self.edges
-
-        for edge in edges:
-            loc1 = self.canvas.locations[edge[1]]
-            loc2 = self.canvas.locations[edge[2]]
-            self.canvas.lines.append(
-                self.canvas.create_line(
-                    loc1[0] + xOffset,
-                    loc1[1] + yOffset,
-                    loc2[0] + xOffset,
-                    loc2[1] + yOffset,
-                    width=2,
-                    fill=fill,
-                )
-            )
-
-    def getRouteCost(self, vertices: Sequence["Vertex"] | None = None) -> float:
-        """Sum total cost for all existing edges (the total distance travelled w/ current route)"""
-        cost = 0
-        if not vertices:
-            for edge in self.edges:
-                cost += edge[0]
-            return cost
-
-        # keys = set(self.adj_list)
-        # if vertices[0] not in keys:
-        #     raise Exception("Invalid vertex in provided route.")
-
-        for i in range(1, len(vertices)):
-            # if vertices[i] not in keys:
-            #     raise Exception("Invalid vertex in provided route.")
-            for adjVert, weight in self.adj_list[vertices[i]]:
-                if adjVert == vertices[i - 1]:
-                    cost += weight
-                    break
-        return cost
-
-    def nearestNeighborRoute(
-        self, startVertex: int | None = None
-    ) -> tuple[list["Vertex"], float]:
-        """
-        Get a guess at the optimal route by going to the least costly connected vector.
-        Time complexity: O(n+n(nlogn)+n+n) -> O((n^2+n)logn)
-        - n to put each vertex in set
-        - n(nlogn) to merge sort list of edges to all other vertices for all n vertices
-        - nlogn to loop through every vertex and check if not already visited in set as more are visited
-        - n to get the distance from last in route to start vertex
-        """
-        if not startVertex:
-            startVertex = self.canvas.getStartPin()
-
-        unvisited = set(vert for vert in list(self.adj_list))
-        unvisited.remove(startVertex)
-        route = [startVertex]
-        distance = 0
-
-        for vert in list(self.adj_list):
-            self.adj_list[vert].sort(key=lambda edge: edge[1])
-
-        # i think i can make this more efficient... how? use sets to see if existing visit?
-        while unvisited:
-            lastVert = route[-1]
-            nextVert = None
-            weight = 0
-            for adjVert, dist in self.adj_list[lastVert]:
-                if adjVert in unvisited:
-                    nextVert, weight = adjVert, dist
-                    break
-            route.append(nextVert)
-            distance += weight
-            unvisited.remove(nextVert)
-        route.append(startVertex)
-        for edge in self.adj_list[startVertex]:
-            v2, w = edge
-            if v2 == route[-2]:
-                distance += w
-                break
-        return route, distance
-
-    def bruteForceRoute(
-        self, startVertex: int | None = None
-    ) -> tuple[list["Vertex"], float]:
-        """
-        Get the shortest cycle by checking all permutations of paths to compare performance vs efficiency.
-        Time complexity: O((n-1)!/2)
-        - n for each vertex
-        - n-1 due to excluding the start vertex when creating the permutation
-        - (n-1)! for all permutations
-        - dvided by 2 by skipping all reverse permutations
-        """
-        distance = float("inf")
-        route = []
-        if not startVertex:
-            startVertex = self.canvas.getStartPin()
-
-        if len(self.adj_list) <= 0:
-            raise Exception("Missing vertices to construct path")
-
-        # check all permutations of routes
-        intermediaryVertices = set(self.adj_list)
-        intermediaryVertices.remove(startVertex)
-        for r in permutations(intermediaryVertices):
-            # skip reverse routes
-            # from https://stackoverflow.com/questions/960557/how-to-generate-permutations-of-a-list-without-reverse-duplicates-in-python-us
-            # this extended slice reverses the permutation and uses comparison to make sure it is less, so it gets rid of half of perms
-            if r <= r[::-1]:
-                continue
-            # construct cycle from intermediary route and loop back to start
-            newRoute = [startVertex]
-            for v in r:
-                newRoute.append(v)
-            newRoute.append(startVertex)
-
-            newDistance = self.getRouteCost(newRoute)
-            if newDistance < distance:
-                route = newRoute
-                distance = newDistance
-
-        return route, distance
+        self.canvas.drawPairs(
+            [(edge[1], edge[2]) for edge in edges], "edges", clear, fill
+        )
 
     def drawLowerBoundRoute(
         self,
@@ -183,139 +66,22 @@ class DisplayGraph(Graph):
         # TODO figure out how to actually get sequential route to make methods more uniform
         mst = self.getMST()
         route = []
+        self.canvas.drawPairs(
+            [(v1, v2) for _, v1, v2 in mst.edges], "mst", clear, fill, offset
+        )
 
-        if type(offset) is int:
-            xOffset = offset
-            yOffset = offset
-        elif type(offset) is tuple:
-            xOffset = offset[0]
-            yOffset = offset[1]
-        else:
-            # catch in case of invalid argument for offset
-            xOffset = self.canvas.pinImg.pinSize[0] // 2
-            yOffset = self.canvas.pinImg.pinSize[1] // 2
-
-        for edge in mst.edges:
-            _, v1, v2 = edge
-            loc1 = self.canvas.locations[v1]
-            loc2 = self.canvas.locations[v2]
-            self.canvas.lines.append(
-                self.canvas.create_line(
-                    loc1[0] + xOffset,
-                    loc1[1] + yOffset,
-                    loc2[0] + xOffset,
-                    loc2[1] + yOffset,
-                    width=2,
-                    fill=fill,
-                )
-            )
-            self.canvas.tag_lower(self.canvas.lines[-1])
+        _, distance = self.lowerBoundRoute()
+        return route, distance
 
-        distance = 0.0
-        for edge in mst.edges:
-            distance += edge[0]
 
-        return route, distance
+class SparseDisplayGraph(SparseRouteGraph, DisplayGraph):
+    """DisplayGraph on the k nearest candidate graph for big pin sets where the complete graph doesn't fit."""
 
-    def christofidesRoute(self):
-        """
-        Modifying of MST to become 1 cycle to approach optimal solution.
-        Written based off of explanation from here: https://youtu.be/GiDsjIBOVoA?t=726
-        O(n^4) time, but improved by the perfect matching algorithm. Blossom V would improve speed but ran out of time
-        """
-        mst = self.getMST()
-        # get odd degree vertices in MST
-        oddVertices = []
-        for vertex in mst:
-            if len(mst[vertex]) % 2:
-                oddVertices.append(vertex)
-        # pair up odd degree vertices w/ min weight to even out degrees
-        # current implementation is brute force, TODO: blossom 5 implementation
-        # https://pub.ista.ac.at/~vnk/papers/blossom5.pdf
-        minDistance = float("inf")
-        minMatchEdges = []
-        # track permutations to verify skipping repeats for debug
-        # ps1 = []
-        # ps2 = []
-        for p in permutations(oddVertices):
-            # skipping should improve by factor of 4?
-            # skip reverse
-            if p <= p[::-1]:
-                continue
-            # ps1.append(p)
-            # skip subsets of 2 being reversed
-            if p[1::2] < p[::2]:
-                continue
-            # ps2.append(p)
-            # print(f"ps1 test array: ({ps1})\n")
-            # print(f"ps2 test array: ({ps2})\n")
-            edges = []
-            dist = 0
-            for i in range(1, len(p), 2):
-                v1 = p[i - 1]
-                v2 = p[i]
-                w = 0
-                for adjVertex, distance in self[v1]:
-                    if adjVertex == v2:
-                        w = distance
-                        dist += w
-                        break
-
-                edges.append([w, v1, v2])
-
-            if dist < minDistance:
-                minMatchEdges = edges
-                minDistance = dist
-
-        # add min cost perfect match to MST for Eulerian tour
-        for edge in minMatchEdges:
-            mst.addEdge(edge[1], edge[2], edge[0])
-
-        # create new graph by skipping repeated vertices
-        # christofideGraph = DisplayGraph(self.canvas)
-        startVertex = self.canvas.getStartPin()
-        # christofideGraph.addVertex(startVertex)
-        unvisited = {vert for vert in mst}
-        unvisited.remove(startVertex)
-        route = [startVertex]
-        distance = 0
-        while unvisited:
-            lastVert = route[-1]
-            nextVert = None
-            w = None
-            for adjVert, weight in mst[lastVert]:
-                if adjVert not in route:
-                    nextVert = adjVert
-                    w = weight
-                    break
-            # if the mst does not have path to unvisited node, back track until next valid
-            if not nextVert:
-                result = None
-                i = -2
-                while not result:
-                    # then vert before last has another direction it can go
-                    lastVert = route[i]
-                    for adjVert, weight in mst[lastVert]:
-                        if adjVert not in route:
-                            nextVert = adjVert
-                            break
-                    # now find distance from last step to next
-                    result = self.findEdge(route[-1], nextVert)
-                    if result:
-                        w = result[0]
-                    else:
-                        # back trace if needed
-                        i -= 1
-
-            unvisited.remove(nextVert)
-            # christofideGraph.addVertex(nextVert)
-            # christofideGraph.addEdge(route[-1],nextVert,w)
-            distance += w
-            route.append(nextVert)
-
-        distance += self.findEdge(startVertex, route[-1])[0]
-        route.append(startVertex)
-        return route, distance
+    def __init__(self, canvas: "PinCanvas", k: int = 10):
+        SparseRouteGraph.__init__(
+            self, list(canvas.locations), list(canvas.locations.values()), k
+        )
+        self.canvas: PinCanvas = canvas
 
 
 class PinImage(ImageTk.PhotoImage):
@@ -333,6 +99,75 @@ class PinImage(ImageTk.PhotoImage):
         )
 
 
+class LineLayer:
+    """
+    Pool of canvas line items for one kind of drawing (route, MST, comparison routes...).
+    Redrawing leaves lines that are still wanted alone and moves no longer wanted ones with coords() to the new
+    segments, so the Tcl calls are proportional to what changed. Extra items are hidden instead of deleted so
+    later draws reuse them, and whole layer changes (fill, hiding) are one call on the layer's tag.
+    """
+
+    def __init__(self, canvas: "PinCanvas", name: str, width: int = 2):
+        self.canvas = canvas
+        self.tag = f"lines-{name}"
+        self.width = width
+        # segment (x1, y1, x2, y2), endpoints in sorted order -> the visible item drawing it
+        self.showing: dict[tuple[float, float, float, float], int] = {}
+        self.spare: list[int] = []
+        self.fill: str | None = None
+
+    def draw(self, segments: list[tuple[float, float, float, float]], fill: str) -> None:
+        canvas = self.canvas
+        # a segment drawn the other way round is the same line
+        wanted = [
+            segment if segment[:2] <= segment[2:] else segment[2:] + segment[:2]
+            for segment in segments
+        ]
+        wantedSet = set(wanted)
+        showing = {}
+        free = []
+        for segment, item in self.showing.items():
+            if segment in wantedSet:
+                showing[segment] = item
+            else:
+                free.append(item)
+
+        for segment in wanted:
+            if segment in showing:
+                continue
+            if free:
+                item = free.pop()
+                canvas.coords(item, *segment)
+            elif self.spare:
+                item = self.spare.pop()
+                canvas.coords(item, *segment)
+                canvas.itemconfigure(item, state="normal")
+            else:
+                item = canvas.create_line(*segment, width=self.width, fill=fill, tags=self.tag)
+                # keep lines under the pins
+                canvas.tag_lower(item)
+            showing[segment] = item
+
+        for item in free:
+            canvas.itemconfigure(item, state="hidden")
+        self.spare += free
+        self.showing = showing
+        if fill != self.fill:
+            canvas.itemconfigure(self.tag, fill=fill)
+            self.fill = fill
+
+    def clear(self) -> None:
+        if self.showing:
+            self.canvas.itemconfigure(self.tag, state="hidden")
+            self.spare += self.showing.values()
+            self.showing = {}
+
+    def delete(self) -> None:
+        self.canvas.delete(self.tag)
+        self.showing = {}
+        self.spare = []
+
+
 class PinCanvas(ctk.CTkCanvas):
     def __init__(self, master, font, size, **kwargs):
         super().__init__(master, **kwargs)
@@ -344,14 +179,20 @@ class PinCanvas(ctk.CTkCanvas):
             height=size[0],
             width=size[1],
         )
-        self.grid(row=0, column=3, padx=0, pady=0, rowspan=3, sticky="nsew")
+        self.grid(row=0, column=3, padx=0, pady=0, rowspan=4, sticky="nsew")
         set_opacity(self, color="#000001")
         # Pin Stuff
         self.pinImg = PinImage()
         self.bluePinImg = self.pinImg.bluePin()
         self.locations = {}
-        self.lines = []
+        # same pins bucketed by location so overlap checks while dragging don't scan every pin
+        self.pinGrid = PointGrid(self.pinImg.pinSize[0])
+        # pooled line items by layer name ("route", "mst", "comparison"...), see LineLayer
+        self.layers: dict[str, LineLayer] = {}
         self.startPin: int | None = None
+        # complete graph kept in sync with locations as pins are placed, dragged and removed (None past
+        # SPARSE_GRAPH_PINS), solvers get a copy of it on submit so pins can keep moving while they run
+        self.liveGraph: DisplayGraph | None = DisplayGraph(self)
 
         self.pinCoords = ctk.CTkLabel(
             self,
@@ -399,24 +240,20 @@ class PinCanvas(ctk.CTkCanvas):
         newLoc = self.__checkBounds(newLoc)
 
         # prevent overlap on drag by shifting from cursor
-        while True:
-            changed = False
-            for pin2, loc2 in self.locations.items():
-                if loc2 == newLoc and pin != pin2:
-                    offset = 5
-                    newLoc = (newLoc[0] + offset, newLoc[1] + offset)
-                    self.__dragOffset = (
-                        self.__dragOffset[0] + offset,
-                        self.__dragOffset[1] + offset,
-                    )
-                    # self.locations[pin] = newLoc
-                    changed = True
-                    print("Cannot overlap pins!")
-            if not changed:
-                break
+        while self.pinAt(newLoc, ignore=pin) is not None:
+            offset = 5
+            newLoc = (newLoc[0] + offset, newLoc[1] + offset)
+            self.__dragOffset = (
+                self.__dragOffset[0] + offset,
+                self.__dragOffset[1] + offset,
+            )
+            print("Cannot overlap pins!")
 
         self.moveto(pin, newLoc[0], newLoc[1])
         self.locations[pin] = newLoc
+        self.pinGrid.move(pin, newLoc)
+        if self.liveGraph is not None:
+            self.liveGraph.moveVertex(pin, newLoc)
 
     def __setDragOffset(self, event: Event, pin) -> None:
         """Get mouse location offset from top left corner when they start dragging"""
@@ -428,7 +265,10 @@ class PinCanvas(ctk.CTkCanvas):
 
     def __removePin(self, event: Event|None, pin) -> None:
         self.delete(pin)
-        self.locations.pop(pin, None)
+        if self.locations.pop(pin, None) is not None:
+            self.pinGrid.remove(pin)
+            if self.liveGraph is not None:
+                self.liveGraph.removeVertex(pin)
         if self.startPin == pin:
             self.startPin = None
 
@@ -446,17 +286,23 @@ class PinCanvas(ctk.CTkCanvas):
         self.startPin = pin
         self.itemconfigure(pin, image=self.bluePinImg)
 
-    def createPin(self, loc) -> None:
+    def createPin(self, loc) -> int | None:
         """
         Create pin image on canvas at given location, update location in dictionary, and bind the needed functions to the pin.
+        Returns the new pin, None if it would overlap one already placed.
         """
         # maybe add label under pin that denotes tag id? pair in tuple and move together?
-        for pin, loc2 in self.locations.items():
-            if loc2 == loc:
-                print("Cannot overlap pins!")
-                return
+        if self.pinAt(loc) is not None:
+            print("Cannot overlap pins!")
+            return None
         pin = self.create_image(loc[0], loc[1], image=self.pinImg, anchor="nw")
         self.locations[pin] = loc
+        self.pinGrid.insert(pin, loc)
+        if len(self.locations) > SPARSE_GRAPH_PINS:
+            # too big to keep every edge, createCurrentGraph builds the sparse graph instead
+            self.liveGraph = None
+        elif self.liveGraph is not None:
+            self.liveGraph.addVertex(pin, loc)
 
         # use default arguments in order to know which pin called this function since bind only does event
         def moveHandler(event, self=self, pin=pin):
@@ -481,41 +327,52 @@ class PinCanvas(ctk.CTkCanvas):
         self.tag_bind(pin, "<Button-2>", startHandler, add="+")
         
         self.__updateCoordText(None, pin)
+        return pin
+
+    def pinAt(self, loc, ignore=None, radius: float = 0) -> int | None:
+        """
+        A pin placed within radius of loc other than ignore, None if there isn't one.
+        Time complexity: O(1) average, only the grid cells around loc are checked
+        """
+        for pin in self.pinGrid.within(loc[0], loc[1], radius):
+            if pin != ignore:
+                return pin
+        return None
 
     def raisePins(self) -> None:
         for pin in list(self.locations):
             self.tkraise(pin)
 
     def drawAllLines(self):
-        xOffset = self.pinImg.pinSize[0] // 2
-        yOffset = self.pinImg.pinSize[1] // 2
-        for line in self.lines:
-            self.delete(line)
-        for pin1, loc1 in self.locations.items():
-            for pin2, loc2 in self.locations.items():
-                if pin1 != pin2:
-                    self.lines.append(
-                        self.create_line(
-                            loc1[0] + xOffset,
-                            loc1[1] + yOffset,
-                            loc2[0] + xOffset,
-                            loc2[1] + yOffset,
-                            width=2,
-                            fill="#faf7f2",
-                        )
-                    )
+        pins = list(self.locations)
+        self.drawPairs(
+            [(pins[i], pins[j]) for i in range(len(pins)) for j in range(i + 1, len(pins))],
+            "all",
+        )
         self.raisePins()
 
-    def drawRoute(
+    def layer(self, name: str) -> "LineLayer":
+        if name not in self.layers:
+            self.layers[name] = LineLayer(self, name)
+        return self.layers[name]
+
+    def clearLines(self, keep: str | None = None) -> None:
+        """Hide the lines of every layer except keep (which is about to be redrawn anyway)."""
+        for name, layer in self.layers.items():
+            if name != keep:
+                layer.clear()
+
+    def drawPairs(
         self,
-        pins: list["Vertex"],
+        pairs: list[tuple["Vertex", "Vertex"]],
+        layer: str = "route",
         clear: bool = True,
         fill: str = "#faf7f2",
         offset: int | tuple[int, int] | None = None,
     ) -> None:
         """
-        Draw lines between vertices given a list of ordered vertices to traverse through.
-        clear: delete all existing lines before drawing new ones.
+        Draw a line between each pair of pins on the given layer, replacing what that layer showed before.
+        clear: hide the lines of every other layer too.
         fill: line color to use when drawing lines.
         offset: Default (None) used to offset from top left corner to center of pinImg.
             - single int for same offset in x and y
@@ -533,23 +390,35 @@ class PinCanvas(ctk.CTkCanvas):
             yOffset = self.pinImg.pinSize[1] // 2
 
         if clear:
-            for line in self.lines:
-                self.delete(line)
-
-        for i in range(1, len(pins)):
-            loc1 = self.locations[pins[i - 1]]
-            loc2 = self.locations[pins[i]]
-            self.lines.append(
-                self.create_line(
-                    loc1[0] + xOffset,
-                    loc1[1] + yOffset,
-                    loc2[0] + xOffset,
-                    loc2[1] + yOffset,
-                    width=2,
-                    fill=fill,
-                )
+            self.clearLines(keep=layer)
+
+        segments = []
+        for pin1, pin2 in pairs:
+            loc1 = self.locations[pin1]
+            loc2 = self.locations[pin2]
+            segments.append(
+                (loc1[0] + xOffset, loc1[1] + yOffset, loc2[0] + xOffset, loc2[1] + yOffset)
             )
-            self.tag_lower(self.lines[-1])
+        self.layer(layer).draw(segments, fill)
+
+    def drawRoute(
+        self,
+        pins: list["Vertex"],
+        clear: bool = True,
+        fill: str = "#faf7f2",
+        offset: int | tuple[int, int] | None = None,
+        layer: str = "route",
+    ) -> None:
+        """
+        Draw lines between vertices given a list of ordered vertices to traverse through.
+        clear: hide all other lines before drawing new ones.
+        fill: line color to use when drawing lines.
+        offset: Default (None) used to offset from top left corner to center of pinImg.
+            - single int for same offset in x and y
+            - tuple for different offset in x and y
+        layer: line pool to draw into, comparisons use their own so they don't replace the main route
+        """
+        self.drawPairs(list(zip(pins, pins[1:])), layer, clear, fill, offset)
         # self.raisePins()
 
     def getStartPin(self) -> int | None:
@@ -561,21 +430,15 @@ class PinCanvas(ctk.CTkCanvas):
         return self.startPin
 
     def createCurrentGraph(self) -> None:
-        self.graph = DisplayGraph(self)
-
-        def distance(loc1: tuple[int, int], loc2: tuple[int, int]) -> float:
-            return sqrt((loc2[0] - loc1[0]) ** 2 + (loc2[1] - loc1[1]) ** 2)
-
-        pins = list(self.locations)
-        for pin in pins:
-            self.graph.addVertex(pin)
-        for i in range(len(pins)):
-            for j in range(i + 1, len(pins)):
-                self.graph.addEdge(
-                    pins[i],
-                    pins[j],
-                    distance(self.locations[pins[i]], self.locations[pins[j]]),
-                )
+        # past a few thousand pins the complete graph's n^2 matrix gets too big, keep only nearby edges
+        if len(self.locations) > SPARSE_GRAPH_PINS:
+            self.liveGraph = None
+            self.graph = SparseDisplayGraph(self)
+            return
+        if self.liveGraph is None:
+            self.liveGraph = DisplayGraph(self)
+        # copying the matrix is much cheaper than recomputing every distance
+        self.graph = self.liveGraph.copy()
 
         # self.graph.drawEdges()
 
@@ -583,8 +446,24 @@ class PinCanvas(ctk.CTkCanvas):
         """Delete all pins from canvas and clean up any lines."""
         for pin in list(self.locations):
             self.__removePin(None, pin)
-        for line in self.lines:
-            self.delete(line)
+        for layer in self.layers.values():
+            layer.delete()
+        self.layers = {}
+
+    def savePins(self, path: str) -> None:
+        """Save the placed pins and the start pin as a binary pin file (see PinFile)."""
+        pins = list(self.locations)
+        start = pins.index(self.startPin) if self.startPin in self.locations else None
+        PinFile.writePins(path, list(self.locations.values()), start=start)
+
+    def loadPins(self, path: str) -> None:
+        """Replace the placed pins with the ones in a binary pin file."""
+        pinSet = PinFile.readPins(path)
+        self.resetPins()
+        # file index -> pin, None where the pin overlapped an earlier one and was skipped
+        pins = [self.createPin((x, y)) for x, y in pinSet.locations.tolist()]
+        if pinSet.start is not None and pins[pinSet.start] is not None:
+            self.setStartPin(pins[pinSet.start])
 
 
 class PinFrame(ctk.CTkFrame):
@@ -597,7 +476,7 @@ class PinFrame(ctk.CTkFrame):
             height=size[0],
             width=size[1],
         )
-        self.grid(row=0, column=3, padx=0, pady=0, rowspan=3, sticky="nsew")
+        self.grid(row=0, column=3, padx=0, pady=0, rowspan=4, sticky="nsew")
 
         # create another helper in case the frame is above canvas and takes the events instead of the canvas
         def __createPinHelper(event):
@@ -627,6 +506,7 @@ class ContainerFrame(ctk.CTkFrame):
         self.grid_rowconfigure(0, weight=5)
         self.grid_rowconfigure(1, weight=2)
         self.grid_rowconfigure(2, weight=1)
+        self.grid_rowconfigure(3, weight=1)
 
         pinAreaSize = (825, 500)
         self.pinFrame = PinFrame(self, pinAreaSize)
@@ -646,7 +526,7 @@ class ContainerFrame(ctk.CTkFrame):
             row=0, column=0, padx=10, pady=(10, 0), columnspan=3, sticky="sew"
         )
         # create body
-        bodyText = "Double left click to place a pin.\nLeft click drag and drop.\nRight click pin to delete.\nMiddle click to select the start.\nSubmit when ready!"
+        bodyText = "Double left click to place a pin.\nLeft click drag and drop.\nRight click pin to delete.\nMiddle click to select the start.\nCtrl+S / Ctrl+O to save / load pins.\nSubmit when ready!"
         self.body = ctk.CTkLabel(
             self,
             text=bodyText,
@@ -676,6 +556,10 @@ class ContainerFrame(ctk.CTkFrame):
             "Minimum Spanning Tree",
             "Compare to MST Lower Bound",
             "Compare to Brute Force",
+            "Branch and Bound",
+            "Nearest Neigbor + 2-opt",
+            "Christofide's Approximation + 2-opt",
+            "Lin-Kernighan",
         ]
         self.solutionComboBox = ctk.CTkComboBox(
             self,
@@ -698,57 +582,93 @@ class ContainerFrame(ctk.CTkFrame):
         )
         self.resetButton.grid(row=2, column=2, padx=(2, 5), pady=5, sticky="sew")
 
+        # solver progress, only shown while a solve is running
+        self.progressBar = ctk.CTkProgressBar(self, mode="indeterminate")
+        self.progressBar.grid(
+            row=3, column=0, padx=(5, 2), pady=5, columnspan=2, sticky="ew"
+        )
+        self.progressBar.grid_remove()
+        self.cancelButton = ctk.CTkButton(
+            self,
+            text="Cancel",
+            command=self.cancelSolver,
+            font=buttonFont,
+            state="disabled",
+        )
+        self.cancelButton.grid(row=3, column=2, padx=(2, 5), pady=5, sticky="sew")
+
+        self.solverThread: threading.Thread | None = None
+        self.stopEvent = threading.Event()
+        self.solverResults: queue.SimpleQueue = queue.SimpleQueue()
+        # latest (route, distance, elapsed) reported by the running solver and when one was last drawn
+        self.incumbent: tuple[list["Vertex"], float, float] | None = None
+        self.lastRedraw = 0.0
+        # solved routes by pin layout so re-submitting the same pins is instant, None if it can't be opened
+        try:
+            self.routeCache: RouteCache | None = RouteCache()
+        except (OSError, sqlite3.Error) as error:
+            print(f"Route cache unavailable: {error}")
+            self.routeCache = None
+
     def solutionChoice(self, choice):
         self.choice = choice
 
-    def submitLocations(self):
-        self.pinCanvas.createCurrentGraph()
+    def cachedRoute(
+        self, graph: DisplayGraph, method: str, timeLimit: float | None = None
+    ) -> tuple[list["Vertex"], float]:
+        """Route by Route.METHODS name through the route cache (straight to the method without one)."""
+        if self.routeCache is None:
+            return METHODS[method](graph, timeLimit)
+        return self.routeCache.route(graph, method, timeLimit)
+
+    def solve(self, graph: DisplayGraph, choice: str) -> list[tuple[str, list, dict]]:
+        """
+        Run the chosen solution and print its results. Runs on the solver thread so it must not touch Tk,
+        what to draw is returned as ("route", route, drawRoute kwargs) or ("mst", [], drawLowerBoundRoute kwargs).
+        """
         startTime = time()
-        if self.choice == self.SOLUTIONS[0]:
+        if choice == self.SOLUTIONS[0]:
             # Nearest Neighbor
-            route, distance = self.pinCanvas.graph.nearestNeighborRoute()
+            route, distance = self.cachedRoute(graph, "nearest")
             dur = time() - startTime
             print(
                 f"Nearest neighbor distance: {distance} u\nDuration: {dur:9.9f} s\nRoute: {route}"
             )
             print("-" * 15 + "\n")
-        elif self.choice == self.SOLUTIONS[1]:
-            # Brute force
-            route, distance = self.pinCanvas.graph.bruteForceRoute()
+        elif choice == self.SOLUTIONS[1]:
+            # Exact solution, Held-Karp instead of checking every permutation
+            route, distance = self.cachedRoute(graph, "heldkarp")
             dur = time() - startTime
             print(
-                f"Brute force distance: {distance} u\nDuration: {dur:9.9f} s\nRoute: {route}"
+                f"Held-Karp exact distance: {distance} u\nDuration: {dur:9.9f} s\nRoute: {route}"
             )
             print("-" * 15 + "\n")
-        elif self.choice == self.SOLUTIONS[2]:
+        elif choice == self.SOLUTIONS[2]:
             # Christofide algorithm approximation using MST
-            route, distance = self.pinCanvas.graph.christofidesRoute()
+            route, distance = self.cachedRoute(graph, "christofides")
             dur = time() - startTime
             print(
                 f"Christofide's approximation distance: {distance} u\nDuration: {dur:9.9f} s\nRoute: {route}"
             )
             print("-" * 15 + "\n")
-        elif self.choice == self.SOLUTIONS[3]:
+        elif choice == self.SOLUTIONS[3]:
             # MST
-            route, distance = self.pinCanvas.graph.drawLowerBoundRoute()
+            route, distance = graph.lowerBoundRoute()
             dur = time() - startTime
             print(f"MST distance: {distance} u\nDuration: {dur:9.9f} s\nRoute: {route}")
             print("-" * 15 + "\n")
-            return
-        elif self.choice == self.SOLUTIONS[4]:
+            return [("mst", route, {})]
+        elif choice == self.SOLUTIONS[4]:
             # Compare NN and MST
-            route1, distance1 = self.pinCanvas.graph.nearestNeighborRoute()
+            route1, distance1 = graph.nearestNeighborRoute()
             dur1 = time() - startTime
             print(
                 f"Nearest neighbor distance: {distance1} u\nDuration: {dur1:9.9f} s\nRoute: {route1}"
             )
             print("-" * 15 + "\n")
-            self.pinCanvas.drawRoute(route1)
 
             startTime = time()
-            route2, distance2 = self.pinCanvas.graph.drawLowerBoundRoute(
-                clear=False, fill="gray30", offset=(12, 19)
-            )
+            route2, distance2 = graph.lowerBoundRoute()
             dur2 = time() - startTime
             print(
                 f"Lower bound MST distance: {distance2} u\nDuration: {dur2:9.9f} s\nRoute: {route2}"
@@ -756,13 +676,12 @@ class ContainerFrame(ctk.CTkFrame):
             print("-" * 15 + "\n")
 
             startTime = time()
-            route3, distance3 = self.pinCanvas.graph.christofidesRoute()
+            route3, distance3 = graph.christofidesRoute()
             dur3 = time() - startTime
             print(
                 f"Christofide's approximation distance: {distance3} u\nDuration: {dur3:9.9f} s\nRoute: {route3}"
             )
             print("-" * 15 + "\n")
-            self.pinCanvas.drawRoute(route3, clear=False, fill="black", offset=(14, 21))
 
             print(
                 f"Time taken by NN solution: {(dur1 * 100 / dur2):9.3f}% of lower bound MST"
@@ -777,36 +696,39 @@ class ContainerFrame(ctk.CTkFrame):
                 f"Cost of route by Christofide's solution: {(distance3 * 100 / distance2) - 100:9.3f}% more than lower bound MST"
             )
             print("-" * 15 + "\n")
-            return
-        elif True:
+            return [
+                ("route", route1, {}),
+                ("mst", route2, {"clear": False, "fill": "gray30", "offset": (12, 19)}),
+                (
+                    "route",
+                    route3,
+                    {"clear": False, "fill": "black", "offset": (14, 21), "layer": "comparison"},
+                ),
+            ]
+        elif choice == self.SOLUTIONS[5]:
             # Compare NN and brute force
-            route1, distance1 = self.pinCanvas.graph.nearestNeighborRoute()
+            route1, distance1 = graph.nearestNeighborRoute()
             dur1 = time() - startTime
             print(
                 f"Nearest neighbor distance: {distance1} u\nDuration: {dur1:9.9f} s\nRoute: {route1}"
             )
             print("-" * 15 + "\n")
-            self.pinCanvas.drawRoute(route1)
 
             startTime = time()
-            route3, distance3 = self.pinCanvas.graph.christofidesRoute()
+            route3, distance3 = graph.christofidesRoute()
             dur3 = time() - startTime
             print(
                 f"Christofide's approximation distance: {distance3} u\nDuration: {dur3:9.9f} s\nRoute: {route3}"
             )
             print("-" * 15 + "\n")
-            self.pinCanvas.drawRoute(route3, clear=False, fill="black", offset=(12, 19))
 
             startTime = time()
-            route2, distance2 = self.pinCanvas.graph.bruteForceRoute()
+            route2, distance2 = graph.heldKarpRoute()
             dur2 = time() - startTime
             print(
-                f"Brute force distance: {distance2} u\nDuration: {dur2:9.9f} s\nRoute: {route2}"
+                f"Held-Karp exact distance: {distance2} u\nDuration: {dur2:9.9f} s\nRoute: {route2}"
             )
             print("-" * 15 + "\n")
-            self.pinCanvas.drawRoute(
-                route2, clear=False, fill="gray30", offset=(14, 21)
-            )
 
             print(
                 f"Time taken by NN solution: {(dur1 * 100 / dur2):9.3f}% of brute force"
@@ -821,13 +743,178 @@ class ContainerFrame(ctk.CTkFrame):
                 f"Cost of route by Christofide's solution: {(distance3 * 100 / distance2) - 100:9.3f}% more than brute force"
             )
             print("-" * 15 + "\n")
+            return [
+                ("route", route1, {}),
+                (
+                    "route",
+                    route3,
+                    {"clear": False, "fill": "black", "offset": (12, 19), "layer": "comparison"},
+                ),
+                (
+                    "route",
+                    route2,
+                    {"clear": False, "fill": "gray30", "offset": (14, 21), "layer": "exact"},
+                ),
+            ]
+        elif choice == self.SOLUTIONS[6]:
+            # Exact solution pruned with MST lower bounds
+            route, distance = self.cachedRoute(graph, "branchbound")
+            dur = time() - startTime
+            print(
+                f"Branch and bound distance: {distance} u\nDuration: {dur:9.9f} s\nRoute: {route}"
+            )
+            print("-" * 15 + "\n")
+        elif choice == self.SOLUTIONS[7]:
+            # Nearest neighbor improved by local search
+            route, distance = self.cachedRoute(graph, "2opt", 1.0)
+            dur = time() - startTime
+            print(
+                f"Nearest neighbor + 2-opt distance: {distance} u\nDuration: {dur:9.9f} s\nRoute: {route}"
+            )
+            print("-" * 15 + "\n")
+        elif choice == self.SOLUTIONS[8]:
+            # Christofide algorithm approximation improved by local search
+            route, distance = self.cachedRoute(graph, "christofides2opt", 1.0)
+            dur = time() - startTime
+            print(
+                f"Christofide's approximation + 2-opt distance: {distance} u\nDuration: {dur:9.9f} s\nRoute: {route}"
+            )
+            print("-" * 15 + "\n")
+        elif choice == self.SOLUTIONS[9]:
+            # Chained Lin-Kernighan from the nearest neighbor route
+            route, distance = self.cachedRoute(graph, "lk", 5.0)
+            dur = time() - startTime
+            print(
+                f"Lin-Kernighan distance: {distance} u\nDuration: {dur:9.9f} s\nRoute: {route}"
+            )
+            print("-" * 15 + "\n")
+        return [("route", route, {})]
+
+    def submitLocations(self):
+        """
+        Start the chosen solution on a worker thread so the window keeps handling drags while it runs.
+        The result comes back through a queue that pollSolver checks with after(), since only the Tk thread may draw.
+        """
+        if self.solverThread is not None:
+            return
+        # picks a random start pin if none is set, which draws, so it has to happen here. the solver thread only
+        # sees this snapshot, so deleting or clicking pins while it runs doesn't change its start
+        startPin = self.pinCanvas.getStartPin()
+        self.pinCanvas.createCurrentGraph()
+        graph = self.pinCanvas.graph
+        graph.start = startPin
+        self.stopEvent = threading.Event()
+        graph.stop = self.stopEvent.is_set
+        self.incumbent = None
+        graph.improved = self.solverImproved
+
+        self.solverThread = threading.Thread(
+            target=self.runSolver, args=(graph, self.choice), daemon=True
+        )
+        self.solverThread.start()
+        self.submitButton.configure(state="disabled")
+        self.cancelButton.configure(state="normal")
+        self.progressBar.grid()
+        self.progressBar.start()
+        self.after(SOLVER_POLL_MS, self.pollSolver, graph)
+
+    def runSolver(self, graph: DisplayGraph, choice: str) -> None:
+        """
+        Solver thread body, hands the outcome to the Tk thread instead of raising.
+        With ROADTRIP_METRICS set, the phase timings and counters of the solve are printed after it.
+        """
+        if metrics.enabled:
+            metrics.reset()
+        try:
+            with metrics.span(choice):
+                result = self.solve(graph, choice)
+            if metrics.enabled:
+                print(f"Solver metrics:\n{metrics.summary()}")
+                print("-" * 15 + "\n")
+            self.solverResults.put(("done", result))
+        except SolveCancelled:
+            self.solverResults.put(("cancelled", None))
+        except Exception as error:
+            self.solverResults.put(("error", error))
+
+    def pollSolver(self, graph: DisplayGraph) -> None:
+        """Check for the solver thread's outcome, draw it when ready and reset the controls."""
+        try:
+            status, value = self.solverResults.get_nowait()
+        except queue.Empty:
+            self.drawIncumbent()
+            self.after(SOLVER_POLL_MS, self.pollSolver, graph)
             return
+
+        self.solverThread = None
+        self.incumbent = None
+        self.progressBar.stop()
+        self.progressBar.grid_remove()
+        self.submitButton.configure(state="normal")
+        self.cancelButton.configure(state="disabled")
+
+        if status == "cancelled":
+            print("Solve cancelled")
+            print("-" * 15 + "\n")
+        elif status == "error":
+            # re-raise on the Tk thread so it is reported like any other callback error
+            raise value
+        elif any(pin not in self.pinCanvas.locations for pin in graph.vertices):
+            print("Pins were removed while solving, submit again to draw a route")
+            print("-" * 15 + "\n")
+        else:
+            for kind, route, options in value:
+                if kind == "mst":
+                    graph.drawLowerBoundRoute(**options)
+                else:
+                    self.pinCanvas.drawRoute(route, **options)
+
+    def solverImproved(self, route: list["Vertex"], distance: float, elapsed: float) -> None:
+        """Solver thread side of the anytime hook, only keeps the latest route for the Tk thread to draw."""
+        self.incumbent = (route, distance, elapsed)
+
+    def drawIncumbent(self) -> None:
+        """Draw the latest improved route from the running solver, at most once every REDRAW_MS."""
+        incumbent = self.incumbent
+        now = time()
+        if incumbent is None or (now - self.lastRedraw) * 1000 < REDRAW_MS:
+            return
+        self.incumbent = None
+        self.lastRedraw = now
+        route, distance, elapsed = incumbent
+        if any(pin not in self.pinCanvas.locations for pin in route):
+            return
+        print(f"Improved distance: {distance} u after {elapsed:9.3f} s")
         self.pinCanvas.drawRoute(route)
 
+    def cancelSolver(self) -> None:
+        """Ask the running solver to stop, it raises SolveCancelled at its next check."""
+        if self.solverThread is not None:
+            self.stopEvent.set()
+
     def resetPins(self):
         """Remove all pins from canvas"""
         self.pinCanvas.resetPins()
 
+    def savePins(self, event: Event | None = None) -> None:
+        path = filedialog.asksaveasfilename(
+            defaultextension=".pins", filetypes=[("Pin sets", "*.pins")]
+        )
+        if path:
+            self.pinCanvas.savePins(path)
+
+    def loadPins(self, event: Event | None = None) -> None:
+        if self.solverThread is not None:
+            print("Cannot load pins while solving!")
+            return
+        path = filedialog.askopenfilename(filetypes=[("Pin sets", "*.pins")])
+        if not path:
+            return
+        try:
+            self.pinCanvas.loadPins(path)
+        except (OSError, ValueError) as error:
+            print(f"Cannot load pins: {error}")
+
 
 class RoadTripApp(ctk.CTk):
     def __init__(self):
@@ -844,6 +931,8 @@ class RoadTripApp(ctk.CTk):
         self.grid_rowconfigure(0, weight=1)  # configure grid system
         self.grid_columnconfigure(0, weight=1)
         self.container = ContainerFrame(self, font)
+        self.bind("<Control-s>", self.container.savePins)
+        self.bind("<Control-o>", self.container.loadPins)
 
 
 def main():
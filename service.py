@@ -0,0 +1,367 @@
+"""
+Local routing service so other tools can get routes without the GUI.
+
+    python service.py --port 8765 --workers 4
+
+Speaks plain HTTP/1.1 with JSON bodies on localhost:
+    POST /route    {"pins": [[x, y], ...], "method": "lk", "start": 0, "timeLimit": 2.0, "deadline": 10.0}
+                   -> {"route": [...], "distance": ..., "method": ..., "seconds": ..., "coalesced": false}
+    GET  /methods  -> {"methods": [...]}
+    GET  /health   -> {"status": "ok", "stats": {...}}
+
+Solves run in a process pool so the event loop keeps taking requests. Identical requests that arrive while one is
+already being solved wait on that solve instead of starting their own. If the shared solve is stopped at its deadline
+and the waiting request's deadline is later, that request solves again with the time it has left. Every request has
+a deadline in seconds (default DEFAULT_DEADLINE): local searches get their time limit cut to fit it, and the exact
+searches and the Christofides matching are stopped when it passes. A request that runs out of time gets a 504 and
+one with no finite route gets a 422.
+Building the graph, the MST, the nearest neighbor tour and the Euler tour can't be stopped, so a worker can stay busy
+past a 504 while it finishes one of those. They're O(n log n) to O(n^2) in the pin count, well under the O(n^3)
+matching, so this only shows with very large pin sets.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import sha256
+from http import HTTPStatus
+from http.client import HTTPConnection
+from multiprocessing import get_context
+from time import perf_counter, time
+
+import numpy as np
+
+from Route import METHODS, TIMED_METHODS, SolveCancelled, routeGraph
+from RouteCache import RouteCache
+
+DEFAULT_PORT = 8765
+# seconds a request may take when it doesn't say, and the most it may ask for
+DEFAULT_DEADLINE = 30.0
+MAX_DEADLINE = 600.0
+# how long to keep waiting past a deadline for a worker to notice it before answering 504 anyway
+DEADLINE_GRACE = 1.0
+MAX_BODY = 64 * 1024 * 1024
+HEADER_TIMEOUT = 10.0
+
+# route caches opened by this worker process, by path
+workerCaches: dict[str, RouteCache] = {}
+
+
+class ServiceError(Exception):
+    """A request that can't be served, answered with status and the message as {"error": message}."""
+
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def solveInWorker(
+    points: np.ndarray,
+    method: str,
+    start: int,
+    timeLimit: float | None,
+    deadlineAt: float,
+    cachePath: str | None = None,
+) -> tuple[list[int], float]:
+    """
+    Process pool side of a solve. The graph's stop callback gives up once the wall clock passes deadlineAt, which
+    raises SolveCancelled back in the service.
+    - nearest, mst and the non matching phases of christofides don't check it, see the module docstring
+    """
+    cache = None
+    if cachePath:
+        cache = workerCaches.get(cachePath)
+        if cache is None:
+            cache = workerCaches[cachePath] = RouteCache(cachePath)
+        cached = cache.find(points, start, method, timeLimit)
+        if cached is not None:
+            return cached
+    graph = routeGraph(points, start)
+    graph.stop = lambda: time() > deadlineAt
+    if cache is not None:
+        return cache.route(graph, method, timeLimit)
+    return METHODS[method](graph, timeLimit)
+
+
+def requestKey(points: np.ndarray, method: str, start: int, timeLimit: float | None) -> str:
+    """Identity of a route request, requests with the same key get the same answer."""
+    digest = sha256(f"{method}:{start}:{timeLimit}:".encode())
+    digest.update(points.tobytes())
+    return digest.hexdigest()
+
+
+def parseRouteRequest(
+    request: dict, defaultDeadline: float
+) -> tuple[np.ndarray, str, int, float | None, float]:
+    """Checked (points, method, start, timeLimit, deadline) from a /route body, ServiceError 400 if it's invalid."""
+    if not isinstance(request, dict):
+        raise ServiceError(HTTPStatus.BAD_REQUEST, "Body must be a JSON object")
+    method = request.get("method", "lk")
+    if method not in METHODS:
+        raise ServiceError(
+            HTTPStatus.BAD_REQUEST, f"Unknown method {method!r}, expected one of {', '.join(METHODS)}"
+        )
+    try:
+        points = np.asarray(request.get("pins", []), dtype=np.float64)
+    except (TypeError, ValueError):
+        raise ServiceError(HTTPStatus.BAD_REQUEST, "pins must be a list of [x, y] pairs")
+    if points.ndim != 2 or points.shape[1] != 2 or len(points) == 0:
+        raise ServiceError(HTTPStatus.BAD_REQUEST, "pins must be a non empty list of [x, y] pairs")
+    if not np.isfinite(points).all():
+        raise ServiceError(HTTPStatus.BAD_REQUEST, "pins must be finite numbers")
+    start = request.get("start", 0)
+    if not isinstance(start, int) or not 0 <= start < len(points):
+        raise ServiceError(HTTPStatus.BAD_REQUEST, f"start must be a pin index below {len(points)}")
+    timeLimit = request.get("timeLimit", 5.0)
+    deadline = request.get("deadline", defaultDeadline)
+    for name, value in (("timeLimit", timeLimit), ("deadline", deadline)):
+        if value is not None and (not isinstance(value, (int, float)) or value <= 0):
+            raise ServiceError(HTTPStatus.BAD_REQUEST, f"{name} must be a positive number of seconds")
+    return points, method, start, timeLimit, min(deadline or MAX_DEADLINE, MAX_DEADLINE)
+
+
+class RoutingService:
+    """
+    asyncio HTTP server handing route requests to a process pool.
+    Start with start() (port 0 picks a free port, read it back from self.port) and stop with close().
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = DEFAULT_PORT,
+        workers: int | None = None,
+        defaultDeadline: float = DEFAULT_DEADLINE,
+        cachePath: str | None = None,
+    ):
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.defaultDeadline = defaultDeadline
+        self.cachePath = cachePath
+        self.pool: ProcessPoolExecutor | None = None
+        self.server: asyncio.Server | None = None
+        # request key -> (solve future, deadlineAt the solve was started with)
+        self.inFlight: dict[str, tuple[asyncio.Future, float]] = {}
+        self.stats = {"requests": 0, "solves": 0, "coalesced": 0, "deadlines": 0, "errors": 0}
+
+    async def start(self) -> None:
+        # spawn works the same everywhere and doesn't copy the event loop into the workers
+        self.pool = ProcessPoolExecutor(self.workers, mp_context=get_context("spawn"))
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
+    async def serveForever(self) -> None:
+        await self.start()
+        print(f"Routing service on http://{self.host}:{self.port}", file=sys.stderr)
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.close()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """One HTTP request per connection."""
+        try:
+            try:
+                verb, path, body = await asyncio.wait_for(self.readRequest(reader), HEADER_TIMEOUT)
+                status, payload = HTTPStatus.OK, await self.dispatch(verb, path, body)
+            except ServiceError as error:
+                status, payload = error.status, {"error": str(error)}
+            except asyncio.TimeoutError:
+                status, payload = HTTPStatus.REQUEST_TIMEOUT, {"error": "Request not received in time"}
+            except Exception as error:
+                status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": repr(error)}
+            if status >= 400:
+                self.stats["errors"] += 1
+            self.respond(writer, status, payload)
+            await writer.drain()
+        except ConnectionError:
+            # the client left, nobody to answer
+            pass
+        finally:
+            writer.close()
+
+    async def readRequest(self, reader: asyncio.StreamReader) -> tuple[str, str, bytes]:
+        requestLine = (await reader.readline()).decode("latin-1").split()
+        if len(requestLine) != 3:
+            raise ServiceError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+        verb, path, _ = requestLine
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise ServiceError(HTTPStatus.BAD_REQUEST, "Bad Content-Length")
+        if length > MAX_BODY:
+            raise ServiceError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Body over {MAX_BODY} bytes")
+        body = await reader.readexactly(length) if length else b""
+        return verb.upper(), path.split("?", 1)[0], body
+
+    def respond(self, writer: asyncio.StreamWriter, status: HTTPStatus, payload: dict) -> None:
+        # plain JSON only, Infinity and NaN aren't valid for other tools' parsers
+        body = json.dumps(payload, allow_nan=False).encode()
+        head = (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+
+    async def dispatch(self, verb: str, path: str, body: bytes) -> dict:
+        if path == "/health" and verb == "GET":
+            return {"status": "ok", "stats": self.stats, "inFlight": len(self.inFlight)}
+        if path == "/methods" and verb == "GET":
+            return {"methods": list(METHODS)}
+        if path == "/route":
+            if verb != "POST":
+                raise ServiceError(HTTPStatus.METHOD_NOT_ALLOWED, "Use POST for /route")
+            try:
+                request = json.loads(body or b"{}")
+            except ValueError:
+                raise ServiceError(HTTPStatus.BAD_REQUEST, "Body is not valid JSON")
+            return await self.route(request)
+        raise ServiceError(HTTPStatus.NOT_FOUND, f"No {verb} {path}")
+
+    async def route(self, request: dict) -> dict:
+        """Answer a /route body, sharing the solve with any identical request already in flight."""
+        self.stats["requests"] += 1
+        startTime = perf_counter()
+        points, method, start, timeLimit, deadline = parseRouteRequest(request, self.defaultDeadline)
+        deadlineAt = time() + deadline
+        # local searches stop on their own a little before the deadline
+        workLimit = deadline * 0.9
+        if method in TIMED_METHODS and (timeLimit is None or timeLimit > workLimit):
+            timeLimit = workLimit
+
+        key = requestKey(points, method, start, timeLimit)
+        shared = self.inFlight.get(key)
+        coalesced = shared is not None
+        if coalesced:
+            self.stats["coalesced"] += 1
+        else:
+            shared = self.startSolve(key, points, method, start, timeLimit, deadlineAt)
+
+        try:
+            while True:
+                future, sharedDeadlineAt = shared
+                try:
+                    # shielded so one waiter timing out doesn't cancel the solve for the others
+                    route, distance = await asyncio.wait_for(
+                        asyncio.shield(future), deadlineAt - time() + DEADLINE_GRACE
+                    )
+                    break
+                except SolveCancelled:
+                    # the shared solve was stopped at its own earlier deadline, spend what's left of ours on another
+                    if sharedDeadlineAt >= deadlineAt or time() >= deadlineAt:
+                        raise
+                    shared = self.inFlight.get(key)
+                    if shared is None or shared[0] is future:
+                        shared = self.startSolve(key, points, method, start, timeLimit, deadlineAt)
+        except (asyncio.TimeoutError, SolveCancelled):
+            self.stats["deadlines"] += 1
+            raise ServiceError(HTTPStatus.GATEWAY_TIMEOUT, f"No route within the {deadline:g} s deadline")
+        except MemoryError:
+            # held karp's tables grow as 2^n
+            raise ServiceError(
+                HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Too many pins ({len(points)}) for {method}"
+            )
+        if not np.isfinite(distance):
+            # e.g. brute force on fewer than 3 pins, or coordinates so large the distances overflow
+            raise ServiceError(
+                HTTPStatus.UNPROCESSABLE_ENTITY, f"{method} found no finite route through these pins"
+            )
+        return {
+            "route": [int(vert) for vert in route],
+            "distance": float(distance),
+            "method": method,
+            "seconds": perf_counter() - startTime,
+            "coalesced": coalesced,
+        }
+
+    def startSolve(
+        self, key: str, points: np.ndarray, method: str, start: int, timeLimit: float | None, deadlineAt: float
+    ) -> tuple[asyncio.Future, float]:
+        """Hand a solve to the pool and make it the one identical requests share until it's done, returns the entry."""
+        self.stats["solves"] += 1
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            self.pool, solveInWorker, points, method, start, timeLimit, deadlineAt, self.cachePath
+        )
+        self.inFlight[key] = (future, deadlineAt)
+        future.add_done_callback(lambda done: self.solveDone(key, done))
+        return future, deadlineAt
+
+    def solveDone(self, key: str, future: asyncio.Future) -> None:
+        shared = self.inFlight.get(key)
+        if shared is not None and shared[0] is future:
+            del self.inFlight[key]
+        # mark the outcome as seen in case every waiter already gave up on it
+        if not future.cancelled():
+            future.exception()
+
+
+def requestRoute(
+    pins,
+    method: str = "lk",
+    start: int = 0,
+    timeLimit: float | None = 5.0,
+    deadline: float | None = None,
+    host: str = "127.0.0.1",
+    port: int = DEFAULT_PORT,
+) -> dict:
+    """Blocking client for POST /route, returns the JSON answer and raises ServiceError for error statuses."""
+    body = {"pins": np.asarray(pins, dtype=float).tolist(), "method": method, "start": start, "timeLimit": timeLimit}
+    if deadline is not None:
+        body["deadline"] = deadline
+    connection = HTTPConnection(host, port, timeout=(deadline or MAX_DEADLINE) + 2 * DEADLINE_GRACE)
+    try:
+        connection.request(
+            "POST", "/route", json.dumps(body), {"Content-Type": "application/json"}
+        )
+        response = connection.getresponse()
+        answer = json.loads(response.read())
+    finally:
+        connection.close()
+    if response.status != HTTPStatus.OK:
+        raise ServiceError(HTTPStatus(response.status), answer.get("error", ""))
+    return answer
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default localhost only)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, help="solver processes (default one per core)")
+    parser.add_argument(
+        "--deadline",
+        type=float,
+        default=DEFAULT_DEADLINE,
+        help="seconds a request may take when it doesn't give its own deadline",
+    )
+    parser.add_argument("--cache", metavar="PATH", help="route cache file to reuse and store routes in")
+    args = parser.parse_args(argv)
+    service = RoutingService(args.host, args.port, args.workers, args.deadline, args.cache)
+    try:
+        asyncio.run(service.serveForever())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
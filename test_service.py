@@ -0,0 +1,50 @@
+"""
+Checks for the routing service's request sharing. Run with `uv run -m unittest test_service`.
+"""
+
+import asyncio
+import unittest
+
+import numpy as np
+
+from service import RoutingService, ServiceError, requestRoute
+
+
+# christofides on this many pins takes long enough that every request arrives while the first is still solving
+SLOW_PINS = np.random.default_rng(1).random((1500, 2)).tolist()
+
+
+class CoalescingTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.service = RoutingService(port=0, workers=1)
+        await self.service.start()
+
+    async def asyncTearDown(self) -> None:
+        await self.service.close()
+
+    async def ask(self, deadline: float | None = None, delay: float = 0.0) -> dict:
+        await asyncio.sleep(delay)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, lambda: requestRoute(SLOW_PINS, "christofides", deadline=deadline, port=self.service.port)
+        )
+
+    async def testIdenticalRequestsShareOneSolve(self) -> None:
+        for deadline in (None, 60.0):
+            with self.subTest(deadline=deadline):
+                solves = self.service.stats["solves"]
+                replies = await asyncio.gather(*(self.ask(deadline) for _ in range(4)))
+                self.assertEqual(sorted(reply["coalesced"] for reply in replies), [False, True, True, True])
+                self.assertEqual(len({reply["distance"] for reply in replies}), 1)
+                self.assertEqual(self.service.stats["solves"], solves + 1)
+
+    async def testLaterDeadlineOutlivesSharedSolve(self) -> None:
+        short, long = await asyncio.gather(self.ask(0.3), self.ask(60.0, 0.1), return_exceptions=True)
+        self.assertIsInstance(short, ServiceError)
+        self.assertEqual(short.status, 504)
+        self.assertTrue(long["coalesced"])
+        self.assertEqual(self.service.stats["solves"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()